@@ -0,0 +1,630 @@
+"""A local stand-in for the parts of the GitHub REST and GraphQL APIs the plugin reads
+
+The data is generated from a seed, so every run of the benchmark sees the same organization. Responses carry
+ETag / Last-Modified and rate limit headers and honour conditional requests, like the real API. POST /graphql
+answers the PR, issue and closed issue link queries of graphql_client with nodes shaped like GitHub's.
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlencode, urlparse
+import hashlib
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+import requests
+
+EPOCH = datetime(2026, 1, 1)
+
+
+def timestamp(value: datetime):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ") if value else None
+
+
+def parse_timestamp(value: str):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+class Dataset:
+    """A synthetic organization
+
+    Items are spread over the `days` before `now`, a tenth of the users are bots.
+    """
+
+    def __init__(self, organization: str = "bench", repos: int = 5, pulls: int = 200, issues: int = 200,
+                 comments: int = 5, cards: int = 50, users: int = 20, days: int = 365, now: datetime = None,
+                 seed: int = 1):
+        self.organization = organization
+        self.now = now if now else datetime.utcnow().replace(microsecond=0)
+        self.random = random.Random(seed)
+
+        self.users = [f"user{index}" if index % 10 else f"build{index}-bot" for index in range(users)]
+        self.repos = dict()
+        for index in range(repos):
+            name = f"repo{index}"
+            self.repos[name] = self.generate_repo(name, pulls, issues, comments, days)
+
+        self.projects = self.generate_projects(cards)
+
+    def moment(self, days: int):
+        return self.now - timedelta(seconds=self.random.randint(0, days * 24 * 3600))
+
+    def generate_repo(self, name: str, pulls: int, issues: int, comments: int, days: int):
+        items = dict()
+
+        for number in range(1, pulls + 1):
+            created = self.moment(days)
+            updated = min(created + timedelta(hours=self.random.randint(0, 24 * 20)), self.now)
+            state = "open" if self.random.random() < 0.2 else "closed"
+            merged = state == "closed" and self.random.random() < 0.8
+            items[number] = {"pull": True, "number": number, "title": f"PR {number} of {name}",
+                             "body": "Changes " * self.random.randint(5, 50), "state": state,
+                             "user": self.random.choice(self.users), "base": "master" if number % 5 else "develop",
+                             "created": created, "updated": updated,
+                             "closed": updated if state == "closed" else None, "merged": updated if merged else None,
+                             "labels": [], "links": [], "comments": []}
+
+        for number in range(pulls + 1, pulls + issues + 1):
+            created = self.moment(days)
+            updated = min(created + timedelta(hours=self.random.randint(0, 24 * 30)), self.now)
+            state = "open" if self.random.random() < 0.4 else "closed"
+            links = [self.random.randint(1, pulls)] if pulls and state == "closed" else []
+            items[number] = {"pull": False, "number": number, "title": f"Issue {number} of {name}",
+                             "body": "Describes " * self.random.randint(5, 50), "state": state,
+                             "user": self.random.choice(self.users), "assignee": self.random.choice(self.users),
+                             "created": created, "updated": updated,
+                             "closed": updated if state == "closed" else None,
+                             "labels": ["bug"] if self.random.random() < 0.3 else ["enhancement"],
+                             "links": links, "comments": []}
+
+        comment_id = 0
+        for item in items.values():
+            for index in range(self.random.randint(0, comments * 2)):
+                comment_id += 1
+                created = item["created"] + (item["updated"] - item["created"]) * self.random.random()
+                item["comments"].append({"id": comment_id, "body": f"Comment {index}",
+                                         "user": self.random.choice(self.users),
+                                         "created": created.replace(microsecond=0),
+                                         "updated": created.replace(microsecond=0)})
+
+        return items
+
+    def generate_projects(self, cards: int):
+        issues = [(repo, number) for repo, items in self.repos.items() for number, item in items.items()
+                  if not item["pull"]]
+        projects = dict()
+        column_id = 0
+        for project_id in (1, 2):
+            columns = dict()
+            for column_name in ("To do", "In progress", "Done"):
+                column_id += 1
+                columns[column_id] = {"name": column_name, "cards": []}
+            projects[project_id] = {"name": f"Board {project_id}", "columns": columns}
+
+        columns = [column for project in projects.values() for column in project["columns"].values()]
+        for index in range(min(cards, len(issues))):
+            self.random.choice(columns)["cards"].append(issues[index])
+
+        return projects
+
+
+class FakeGithub:
+    """Serves a Dataset on a local port, counting the requests it answers
+
+    `latency` seconds are added to every response.
+    """
+
+    def __init__(self, dataset: Dataset, latency: float = 0.0, per_page_default: int = 30):
+        self.dataset = dataset
+        self.latency = latency
+        self.per_page_default = per_page_default
+        self.lock = Lock()
+        self.requests = 0
+        self.not_modified = 0
+        # Requests charged per Authorization header, 304s are free like on GitHub
+        self.spent = dict()
+
+        handler = type("Handler", (FakeGithubHandler,), {"github": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = 0
+            self.not_modified = 0
+
+    def counts(self):
+        with self.lock:
+            return {"requests": self.requests, "not_modified": self.not_modified, "spent": dict(self.spent)}
+
+    def add_comment(self, repo: str, number: int, comment: dict):
+        """Adds a comment ({"id", "body", "user", "created_at", "updated_at"}) to an issue, updating the issue"""
+        item = self.dataset.repos[repo][number]
+        with self.lock:
+            item["comments"].append({"id": comment["id"], "body": comment["body"], "user": comment["user"],
+                                     "created": parse_timestamp(comment["created_at"]),
+                                     "updated": parse_timestamp(comment["updated_at"])})
+            item["updated"] = max(item["updated"], parse_timestamp(comment["updated_at"]))
+
+    def count(self, status: int, authorization: str = None):
+        """Counts a response, returns the remaining rate limit of the credential that asked for it"""
+        with self.lock:
+            self.requests += 1
+            if status == 304:
+                self.not_modified += 1
+            else:
+                self.spent[authorization] = self.spent.get(authorization, 0) + 1
+            return 5000 - self.spent.get(authorization, 0)
+
+    # JSON documents, shaped like the GitHub API responses PyGithub expects
+
+    def user(self, login: str):
+        return {"login": login, "id": abs(hash(login)) % 100000, "type": "User",
+                "url": f"{self.url}/users/{login}"}
+
+    def full_user(self, login: str):
+        return dict(self.user(login), name=None if login.endswith("-bot") else login.title())
+
+    def repo(self, name: str):
+        organization = self.dataset.organization
+        return {"id": abs(hash(name)) % 100000, "name": name, "full_name": f"{organization}/{name}",
+                "owner": self.user(organization), "private": False,
+                "url": f"{self.url}/repos/{organization}/{name}",
+                "html_url": f"https://github.com/{organization}/{name}",
+                "updated_at": timestamp(self.dataset.now), "pushed_at": timestamp(self.dataset.now)}
+
+    def organization(self):
+        organization = self.dataset.organization
+        return {"login": organization, "id": 1, "name": organization.title(), "url": f"{self.url}/orgs/{organization}"}
+
+    def issue_url(self, repo: str, number: int):
+        return f"{self.url}/repos/{self.dataset.organization}/{repo}/issues/{number}"
+
+    def issue(self, repo: str, item: dict):
+        document = {"id": item["number"], "number": item["number"], "title": item["title"], "body": item["body"],
+                    "state": item["state"], "user": self.user(item["user"]),
+                    "assignee": self.user(item["assignee"]) if item.get("assignee") else None,
+                    "labels": [{"name": label} for label in item["labels"]],
+                    "created_at": timestamp(item["created"]), "updated_at": timestamp(item["updated"]),
+                    "closed_at": timestamp(item["closed"]), "url": self.issue_url(repo, item["number"]),
+                    "repository_url": f"{self.url}/repos/{self.dataset.organization}/{repo}",
+                    "comments": len(item["comments"])}
+        if item["pull"]:
+            document["pull_request"] = {"url": self.pull_url(repo, item["number"]),
+                                        "merged_at": timestamp(item["merged"])}
+        return document
+
+    def pull_url(self, repo: str, number: int):
+        return f"{self.url}/repos/{self.dataset.organization}/{repo}/pulls/{number}"
+
+    def pull(self, repo: str, item: dict):
+        return {"id": item["number"], "number": item["number"], "title": item["title"], "body": item["body"],
+                "state": item["state"], "user": self.user(item["user"]),
+                "labels": [{"name": label} for label in item["labels"]],
+                "base": {"ref": item["base"], "label": f"{self.dataset.organization}:{item['base']}"},
+                "created_at": timestamp(item["created"]), "updated_at": timestamp(item["updated"]),
+                "closed_at": timestamp(item["closed"]), "merged_at": timestamp(item["merged"]),
+                "merged": item["merged"] is not None, "url": self.pull_url(repo, item["number"]),
+                "issue_url": self.issue_url(repo, item["number"])}
+
+    def author(self, login: str):
+        return {"login": login, "name": self.full_user(login)["name"]}
+
+    def pull_node(self, item: dict):
+        state = "MERGED" if item["merged"] else item["state"].upper()
+        return {"number": item["number"], "title": item["title"], "body": item["body"], "state": state,
+                "createdAt": timestamp(item["created"]), "updatedAt": timestamp(item["updated"]),
+                "closedAt": timestamp(item["closed"]), "mergedAt": timestamp(item["merged"]),
+                "baseRefName": item["base"], "author": self.author(item["user"]),
+                "labels": {"nodes": [{"name": label} for label in item["labels"]]}}
+
+    def issue_node(self, item: dict, links: bool = False):
+        node = {"number": item["number"], "title": item["title"], "body": item["body"],
+                "state": item["state"].upper(), "createdAt": timestamp(item["created"]),
+                "updatedAt": timestamp(item["updated"]), "closedAt": timestamp(item["closed"]),
+                "author": self.author(item["user"]),
+                "assignees": {"nodes": [self.author(item["assignee"])] if item.get("assignee") else []},
+                "labels": {"nodes": [{"name": label} for label in item["labels"]]}}
+        if links:
+            node["closedByPullRequestsReferences"] = {"nodes": [{"number": number} for number in item["links"]]}
+        return node
+
+    def comment(self, repo: str, number: int, comment: dict):
+        return {"id": comment["id"], "body": comment["body"], "user": self.user(comment["user"]),
+                "created_at": timestamp(comment["created"]), "updated_at": timestamp(comment["updated"]),
+                "issue_url": self.issue_url(repo, number),
+                "url": f"{self.url}/repos/{self.dataset.organization}/{repo}/issues/comments/{comment['id']}"}
+
+
+class FakeGithubProcess:
+    """A FakeGithub run by a child process, so the server's threads and allocations stay out of the measurements
+
+    Takes the Dataset keyword arguments. Counts and dataset changes go through the /_control endpoints, which are
+    not counted.
+    """
+
+    def __init__(self, latency: float = 0.0, **dataset):
+        arguments = dict(dataset, now=dataset["now"].isoformat()) if dataset.get("now") else dataset
+        self.command = [sys.executable, __file__, "--latency", str(latency), "--dataset", json.dumps(arguments)]
+        self.process = None
+        self.url = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.url = self.process.stdout.readline().strip()
+        self.control = requests.Session()
+        return self
+
+    def __exit__(self, *args):
+        # The child serves until its stdin closes
+        self.process.stdin.close()
+        self.process.wait()
+        self.control.close()
+
+    def counts(self):
+        return self.control.get(f"{self.url}/_control/counts").json()
+
+    @property
+    def requests(self):
+        return self.counts()["requests"]
+
+    @property
+    def not_modified(self):
+        return self.counts()["not_modified"]
+
+    @property
+    def spent(self):
+        return self.counts()["spent"]
+
+    def reset_counts(self):
+        self.control.post(f"{self.url}/_control/reset").raise_for_status()
+
+    def add_comment(self, repo: str, number: int, comment: dict):
+        self.control.post(f"{self.url}/_control/comment",
+                          json={"repo": repo, "number": number, "comment": comment}).raise_for_status()
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    github = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/_control/"):
+            return self.control()
+
+        if self.github.latency:
+            time.sleep(self.github.latency)
+
+        url = urlparse(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["search", "issues"]:
+            return self.respond_page(self.search(), search=True)
+
+        try:
+            result = self.route(parts)
+        except KeyError:
+            result = None
+
+        if result is None:
+            return self.respond(404, {"message": "Not Found"})
+
+        if isinstance(result, tuple):
+            document, last_modified = result
+        else:
+            document, last_modified = result, None
+
+        if isinstance(document, list):
+            return self.respond_page(document)
+
+        return self.respond(200, document, last_modified=last_modified)
+
+    def control(self):
+        """Answers the benchmark's /_control requests, which are neither delayed nor counted"""
+        github = self.github
+        if self.command == "POST":
+            arguments = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        else:
+            arguments = dict()
+
+        action = self.path[len("/_control/"):]
+        if action == "counts":
+            document = github.counts()
+        elif action == "reset":
+            github.reset_counts()
+            document = dict()
+        elif action == "comment":
+            github.add_comment(arguments["repo"], int(arguments["number"]), arguments["comment"])
+            document = dict()
+        else:
+            document = None
+
+        body = json.dumps(document).encode()
+        self.send_response(200 if document is not None else 404)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.startswith("/_control/"):
+            return self.control()
+
+        if self.github.latency:
+            time.sleep(self.github.latency)
+
+        self.query = dict()
+        if urlparse(self.path).path != "/graphql":
+            return self.respond(404, {"message": "Not Found"})
+
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        self.respond(200, self.graphql(payload["query"], payload.get("variables") or dict()), resource="graphql")
+
+    def graphql(self, query: str, variables: dict):
+        """Answers the repository(...) { pullRequests | issues } queries of graphql_client, newest update first"""
+        github = self.github
+        items = github.dataset.repos.get(variables.get("name")) \
+            if variables.get("owner") == github.dataset.organization else None
+        if items is None:
+            full_name = f"{variables.get('owner')}/{variables.get('name')}"
+            return {"data": {"repository": None},
+                    "errors": [{"type": "NOT_FOUND",
+                                "message": f"Could not resolve to a Repository with the name '{full_name}'."}]}
+
+        states = variables.get("states")
+        since = parse_timestamp(variables["since"]) if variables.get("since") else None
+        if "pullRequests(" in query:
+            connection = "pullRequests"
+            nodes = [github.pull_node(item) for item in items.values() if item["pull"]
+                     and (not variables.get("base") or item["base"] == variables["base"])]
+        else:
+            connection = "issues"
+            links = "closedByPullRequestsReferences" in query
+            if links:
+                states = ["CLOSED"]
+            nodes = [github.issue_node(item, links) for item in items.values() if not item["pull"]
+                     and (since is None or item["updated"] >= since)]
+
+        nodes = [node for node in nodes if not states or node["state"] in states]
+        nodes.sort(key=lambda node: node["updatedAt"], reverse=True)
+
+        first = int(re.search(rf"{connection}\(first: (\d+)", query).group(1))
+        start = int(variables.get("cursor") or 0)
+        end = start + min(first, 100)
+        page = {"pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)}, "nodes": nodes[start:end]}
+
+        return {"data": {"repository": {connection: page}}}
+
+    def route(self, parts):
+        github = self.github
+        dataset = github.dataset
+
+        if parts == ["rate_limit"]:
+            core = {"limit": 5000, "remaining": 5000, "reset": int(time.time()) + 3600}
+            return {"resources": {"core": core, "search": core, "graphql": core}, "rate": core}
+
+        if parts[0] == "users" and len(parts) == 2:
+            return github.full_user(parts[1])
+
+        if parts[0] == "orgs" and parts[1] == dataset.organization:
+            if len(parts) == 2:
+                return github.organization()
+            if parts[2:] == ["repos"]:
+                return [github.repo(name) for name in dataset.repos]
+            if parts[2:] == ["projects"]:
+                return [self.project(project_id) for project_id in dataset.projects]
+
+        if parts[0] == "projects":
+            if parts[1] == "columns" and len(parts) == 3:
+                column_id = int(parts[2])
+                for project_id, project in dataset.projects.items():
+                    if column_id in project["columns"]:
+                        return {"id": column_id, "name": project["columns"][column_id]["name"],
+                                "url": f"{github.url}/projects/columns/{column_id}",
+                                "project_url": f"{github.url}/projects/{project_id}",
+                                "cards_url": f"{github.url}/projects/columns/{column_id}/cards"}
+            if len(parts) == 2:
+                return self.project(int(parts[1]))
+            if parts[1] == "columns" and parts[3:] == ["cards"]:
+                column_id = int(parts[2])
+                for project in dataset.projects.values():
+                    if column_id in project["columns"]:
+                        return [self.card(column_id, index, repo, number) for index, (repo, number)
+                                in enumerate(project["columns"][column_id]["cards"])]
+            if parts[2:] == ["columns"]:
+                project = dataset.projects[int(parts[1])]
+                return [{"id": column_id, "name": column["name"],
+                         "url": f"{github.url}/projects/columns/{column_id}",
+                         "cards_url": f"{github.url}/projects/columns/{column_id}/cards"}
+                        for column_id, column in project["columns"].items()]
+
+        if parts[0] == "repos" and parts[1] == dataset.organization:
+            repo = parts[2]
+            items = dataset.repos[repo]
+            rest = parts[3:]
+
+            if not rest:
+                return github.repo(repo)
+            if rest == ["projects"]:
+                return []
+            if rest == ["pulls"]:
+                return self.pulls(repo, items)
+            if rest[0] == "pulls" and len(rest) == 2:
+                return github.pull(repo, items[int(rest[1])])
+            if rest == ["issues"]:
+                return self.issues(repo, items)
+            if rest == ["issues", "comments"]:
+                return self.repo_comments(repo, items)
+            if rest[0] == "issues" and len(rest) >= 2:
+                item = items[int(rest[1])]
+                if len(rest) == 2:
+                    return github.issue(repo, item), item["updated"]
+                if rest[2:] == ["comments"]:
+                    since = parse_timestamp(self.query["since"]) if "since" in self.query else None
+                    return [github.comment(repo, item["number"], comment) for comment in item["comments"]
+                            if since is None or comment["updated"] >= since]
+                if rest[2:] == ["timeline"]:
+                    return [{"event": "cross-referenced", "id": index,
+                             "source": {"type": "issue", "issue": github.issue(repo, items[number])}}
+                            for index, number in enumerate(item["links"])]
+
+        return None
+
+    def project(self, project_id: int):
+        github = self.github
+        return {"id": project_id, "name": github.dataset.projects[project_id]["name"],
+                "url": f"{github.url}/projects/{project_id}",
+                "columns_url": f"{github.url}/projects/{project_id}/columns"}
+
+    def card(self, column_id: int, index: int, repo: str, number: int):
+        github = self.github
+        card_id = column_id * 100000 + index
+        return {"id": card_id, "note": None, "url": f"{github.url}/projects/columns/cards/{card_id}",
+                "column_url": f"{github.url}/projects/columns/{column_id}",
+                "content_url": github.issue_url(repo, number)}
+
+    def ordered(self, items, key: str):
+        reverse = self.query.get("direction", "desc") == "desc"
+        return sorted(items, key=lambda item: item[key], reverse=reverse)
+
+    def pulls(self, repo: str, items: dict):
+        state = self.query.get("state", "open")
+        base = self.query.get("base")
+        pulls = [item for item in items.values() if item["pull"]
+                 and (state == "all" or item["state"] == state)
+                 and (base is None or item["base"] == base)]
+
+        key = "updated" if self.query.get("sort") == "updated" else "created"
+        return [self.github.pull(repo, item) for item in self.ordered(pulls, key)]
+
+    def issues(self, repo: str, items: dict):
+        state = self.query.get("state", "open")
+        since = parse_timestamp(self.query["since"]) if "since" in self.query else None
+        issues = [item for item in items.values()
+                  if (state == "all" or item["state"] == state) and (since is None or item["updated"] >= since)]
+
+        key = "updated" if self.query.get("sort") == "updated" else "created"
+        return [self.github.issue(repo, item) for item in self.ordered(issues, key)]
+
+    def repo_comments(self, repo: str, items: dict):
+        since = parse_timestamp(self.query["since"]) if "since" in self.query else None
+        comments = [(item["number"], comment) for item in items.values() for comment in item["comments"]
+                    if since is None or comment["updated"] >= since]
+        comments.sort(key=lambda pair: pair[1]["updated"], reverse=self.query.get("direction") == "desc")
+        return [self.github.comment(repo, number, comment) for number, comment in comments]
+
+    def search(self):
+        """Answers the issue search qualifiers the plugin uses: org, is, base and updated/created/closed ranges"""
+        github = self.github
+        filters = list()
+        for term in self.query.get("q", "").split():
+            qualifier, _, value = term.partition(":")
+            if qualifier == "org" and value != github.dataset.organization:
+                return []
+            if qualifier == "is" and value in ("pr", "issue"):
+                filters.append(lambda item, pull=value == "pr": item["pull"] == pull)
+            elif qualifier == "is" and value in ("open", "closed"):
+                filters.append(lambda item, state=value: item["state"] == state)
+            elif qualifier == "base":
+                filters.append(lambda item, base=value: item.get("base") == base)
+            elif qualifier in ("updated", "created", "closed") and value.startswith(">="):
+                start = datetime.strptime(value[2:12], "%Y-%m-%d")
+                filters.append(lambda item, key=qualifier, start=start: item[key] is not None and item[key] >= start)
+
+        matches = [(repo, item) for repo, items in github.dataset.repos.items() for item in items.values()
+                   if all(check(item) for check in filters)]
+        key = "updated" if self.query.get("sort") == "updated" else "created"
+        matches.sort(key=lambda match: match[1][key], reverse=self.query.get("order", "desc") == "desc")
+
+        return [github.issue(repo, item) for repo, item in matches]
+
+    def respond_page(self, documents: list, search: bool = False):
+        page = int(self.query.get("page", 1))
+        per_page = min(int(self.query.get("per_page", self.github.per_page_default)), 100)
+        start = (page - 1) * per_page
+
+        headers = dict()
+        if start + per_page < len(documents):
+            query = dict(self.query, page=page + 1, per_page=per_page)
+            headers["Link"] = f'<{self.github.url}{urlparse(self.path).path}?{urlencode(query)}>; rel="next"'
+
+        page_documents = documents[start:start + per_page]
+        if search:
+            page_documents = {"total_count": len(documents), "incomplete_results": False, "items": page_documents}
+
+        self.respond(200, page_documents, headers=headers)
+
+    def respond(self, status: int, document, last_modified: datetime = None, headers: dict = None,
+                resource: str = "core"):
+        body = json.dumps(document).encode()
+        headers = dict(headers) if headers else dict()
+        headers["ETag"] = f'"{hashlib.sha1(body).hexdigest()}"'
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+        if status == 200 and self.not_modified(headers, last_modified):
+            status, body = 304, b""
+
+        remaining = self.github.count(status, self.headers.get("Authorization"))
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", str(max(remaining, 0)))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        self.send_header("X-RateLimit-Resource", resource)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, headers: dict, last_modified: datetime):
+        if self.headers.get("If-None-Match"):
+            return self.headers["If-None-Match"] == headers["ETag"]
+
+        if self.headers.get("If-Modified-Since") and last_modified:
+            try:
+                since = parsedate_to_datetime(self.headers["If-Modified-Since"]).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                return False
+            return last_modified <= since
+
+        return False
+
+
+def main():
+    """Serves a dataset until stdin closes, printing the server's URL first (see FakeGithubProcess)"""
+    parser = ArgumentParser(description=main.__doc__)
+    parser.add_argument("--dataset", default="{}", help="Dataset keyword arguments as JSON")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    arguments = json.loads(args.dataset)
+    if arguments.get("now"):
+        arguments["now"] = datetime.fromisoformat(arguments["now"])
+
+    with FakeGithub(Dataset(**arguments), latency=args.latency) as github:
+        print(github.url, flush=True)
+        sys.stdin.read()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Runs the plugin commands against the fake GitHub API and reports what each one cost
+
+    python benchmarks/run.py --repos 5 --pulls 200 --issues 200 --output results.json
+    python benchmarks/run.py --compare results.json
+
+Every command is run twice on the same client: a cold run, and a warm run that shows what the caches save. The
+fake server runs in a child process, so peak memory only counts the plugin's allocations.
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+from inspect import getmembers, isfunction, unwrap
+from tempfile import TemporaryDirectory
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_github import FakeGithubProcess  # noqa: E402
+from github_summary.client import GithubSummary  # noqa: E402
+from github_summary.graphql_client import GraphQLClient  # noqa: E402
+from github_summary.records import parse_timestamp  # noqa: E402
+from github_summary.webhooks import replay  # noqa: E402
+
+WEBHOOK_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "webhooks")
+# Deliveries GitHub sent for an issue, of which the ones under missed/ never reached the listener
+SKIPPED_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "webhooks-skipped")
+# GraphQL responses recorded from GRAPHQL_DATASET three nodes per page, so the listings span several pages
+GRAPHQL_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "graphql")
+GRAPHQL_DATASET = {"repos": 1, "pulls": 8, "issues": 8, "comments": 0, "cards": 0, "now": datetime(2026, 10, 1)}
+
+# GraphQLClient listing -> the GithubSummary method reading the same items over REST
+REST_LISTINGS = {"get_pulls": "get_window_pulls", "get_issues": "get_window_issues",
+                 "get_closed_issue_links": "get_closed_issue_links"}
+
+# Command name -> keyword arguments, filled in with the organization, a repo and a ticket directory. A suffix in
+# brackets names another scenario for the same command. Every command of GithubSummary needs at least one
+SCENARIOS = {
+    "get_latest_active_prs": lambda context: {"organization": context["organization"],
+                                              "repoName": context["repo"], "days": 30},
+    "get_latest_closed_prs": lambda context: {"organization": context["organization"],
+                                              "repoName": context["repo"], "days": 14},
+    "generate_change_log": lambda context: {"organization": context["organization"], "repoName": context["repo"],
+                                            "merge_date": (time.time() - 30 * 24 * 3600) * 1000},
+    "get_pr_open_closed": lambda context: {"organization": context["organization"], "repoName": context["repo"],
+                                           "days": 90, "base": "master"},
+    "get_pr_daily_metrics": lambda context: {"organization": context["organization"], "repoName": context["repo"],
+                                             "days": 90, "base": "master"},
+    "get_latest_created_tickets": lambda context: {"organization": context["organization"],
+                                                   "repoName": context["repo"], "days": 14},
+    "get_latest_closed_tickets": lambda context: {"organization": context["organization"],
+                                                  "repoName": context["repo"], "days": 14},
+    "get_repos_by_organization": lambda context: {"organization": context["organization"]},
+    "get_repo_summary": lambda context: {"organization": context["organization"], "repoName": context["repo"]},
+    "get_organization_summary": lambda context: {"organization": context["organization"]},
+    "get_organization_summary[search]": lambda context: {"organization": context["organization"], "mode": "search"},
+    "get_projects_issues_summary": lambda context: {"organization": context["organization"]},
+    "full_directory_sync": lambda context: {"directory": context["directory"],
+                                            "organization": context["organization"], "repo_name": ""},
+    "get_pr_daily_metrics_json": lambda context: {"organization": context["organization"],
+                                                  "repoName": context["repo"], "days": 90, "base": "master"},
+    "get_project_tickets": lambda context: {"organization_name": context["organization"]},
+    "sync_project_tickets": lambda context: {"directory": context["directory"],
+                                             "organization": context["organization"], "repo_name": ""},
+    "sync_tickets_directory": lambda context: {"directory": context["directory"]},
+    "get_performance_stats": lambda context: {},
+}
+
+
+def commands():
+    """Returns the names of the brewtils commands of GithubSummary in the order they are defined"""
+    methods = [(name, fn) for name, fn in getmembers(GithubSummary, isfunction) if hasattr(fn, "_command")]
+    return [name for name, fn in sorted(methods, key=lambda method: unwrap(method[1]).__code__.co_firstlineno)]
+
+
+def check_scenarios():
+    """Returns what keeps SCENARIOS from covering exactly the plugin's commands"""
+    names = commands()
+    covered = set(name.split("[")[0] for name in SCENARIOS)
+    return [f"{name} has no benchmark scenario" for name in names if name not in covered] + \
+           [f"{name} is not a command" for name in sorted(covered - set(names))]
+
+
+def replay_webhooks(client: GithubSummary, directory: str):
+    """Applies the recorded webhook deliveries to a ticket directory of their own"""
+    client.webhooks.directory = os.path.join(directory, "webhooks")
+    os.makedirs(client.webhooks.directory, exist_ok=True)
+    return replay(client.webhooks, WEBHOOK_FIXTURES)
+
+
+def replay_skipped_delivery(client: GithubSummary, github: FakeGithubProcess, directory: str):
+    """Syncs a ticket, lets GitHub add the comments of every recorded delivery while only some are delivered, and
+    checks the next sync fetches the comments of the missed ones"""
+    client.webhooks.directory = directory
+    with client.open_ticket_store(directory) as store:
+        store.save({"bench/repo0/201": {"organization": "bench", "repo": "repo0", "number": "201", "project": []}})
+    client.sync_tickets_directory(directory)
+
+    missed = list()
+    for kind in ("missed", "delivered"):
+        for file in sorted(os.listdir(os.path.join(SKIPPED_FIXTURES, kind))):
+            with open(os.path.join(SKIPPED_FIXTURES, kind, file)) as json_file:
+                comment = json.load(json_file)["payload"]["comment"]
+
+            github.add_comment("repo0", 201, dict(comment, user=comment["user"]["login"]))
+            if kind == "missed":
+                missed.append(str(comment["id"]))
+
+    replay(client.webhooks, os.path.join(SKIPPED_FIXTURES, "delivered"))
+    ticket, = client.sync_tickets_directory(directory)
+
+    lost = [comment_id for comment_id in missed if comment_id not in ticket["comments"]]
+    if lost:
+        raise AssertionError(f"The sync after the replay did not fetch comments {', '.join(lost)}")
+
+
+def pull_fields(pr):
+    return (pr.number, pr.title, pr.body, pr.state, pr.user.login, pr.user.name, [label.name for label in pr.labels],
+            pr.created_at, pr.updated_at, pr.closed_at, pr.merged_at, pr.base.ref)
+
+
+def issue_fields(issue):
+    assignee = (issue.assignee.login, issue.assignee.name) if issue.assignee else None
+    return (issue.number, issue.title, issue.body, issue.state, issue.user.login, issue.user.name, assignee,
+            [label.name for label in issue.labels], issue.created_at, issue.updated_at, issue.closed_at)
+
+
+def listing_fields(method: str, items: list):
+    if method == "get_pulls":
+        return [pull_fields(pr) for pr in items]
+    if method == "get_issues":
+        return [issue_fields(issue) for issue in items]
+    return [(issue_fields(issue), sorted(links)) for issue, links in items]
+
+
+def check_graphql_records(client: GithubSummary):
+    """Lists the recorded GraphQL responses through GraphQLClient and checks it requests exactly the recorded pages,
+    in order, and returns the same PRs, issues and links as the REST path of `client` on the recorded dataset"""
+    repo = client.get_repo("bench", "repo0")
+
+    for file in sorted(os.listdir(GRAPHQL_FIXTURES)):
+        with open(os.path.join(GRAPHQL_FIXTURES, file)) as json_file:
+            fixture = json.load(json_file)
+        method = fixture["method"]
+        arguments = dict(fixture["arguments"], since=parse_timestamp(fixture["arguments"]["since"]))
+        pages = list(fixture["requests"])
+
+        def post(payload):
+            if not pages or payload["variables"] != pages[0]["variables"]:
+                raise AssertionError(f"{file}: requested {payload['variables']}, which was not the next recorded "
+                                     f"page")
+            return pages.pop(0)["response"]
+
+        graphql = listing_fields(method, getattr(GraphQLClient(None, post=post), method)("bench/repo0", **arguments))
+        if pages:
+            raise AssertionError(f"{file}: stopped with {len(pages)} recorded pages left")
+
+        rest = listing_fields(method, getattr(client, REST_LISTINGS[method])(repo, **arguments))
+        if graphql != rest:
+            raise AssertionError(f"{file}: GraphQL listed {graphql}, REST listed {rest}")
+
+
+# A run slower than the baseline by more than this fraction is reported as a regression
+TOLERANCE = 0.2
+
+
+def measure(server: FakeGithubProcess, fn, **kwargs):
+    server.reset_counts()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        fn(**kwargs)
+        error = None
+    except Exception as exc:
+        error = repr(exc)
+    wall_time = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"wall_time": round(wall_time, 4), "requests": server.requests, "not_modified": server.not_modified,
+            "peak_memory": peak, "error": error}
+
+
+def run(args):
+    dataset = {"repos": args.repos, "pulls": args.pulls, "issues": args.issues, "comments": args.comments,
+               "cards": args.cards, "seed": args.seed}
+
+    results = dict()
+    with FakeGithubProcess(latency=args.latency, **dataset) as server, TemporaryDirectory() as directory:
+        tokens = [f"bench-{index}" for index in range(1, args.tokens)]
+        client = GithubSummary(None, token="bench-0", tokens=tokens, base_url=server.url, backend=args.backend,
+                               report_cache_ttl=args.report_cache_ttl)
+        context = {"organization": "bench", "repo": "repo0", "directory": directory}
+
+        for command in commands():
+            for name, scenario in SCENARIOS.items():
+                if name.split("[")[0] != command or (args.only and name not in args.only):
+                    continue
+
+                fn = getattr(client, command)
+                results[name] = {"cold": measure(server, fn, **scenario(context)),
+                                 "warm": measure(server, fn, **scenario(context))}
+                print(f"{name}: {json.dumps(results[name])}")
+
+    # The recorded deliveries refer to issue #201 of repo0, the first issue with the default 200 PRs
+    if not args.only or "webhook_replay" in args.only:
+        with FakeGithubProcess(latency=args.latency, repos=1) as server, TemporaryDirectory() as directory:
+            client = GithubSummary(None, token="bench-0", base_url=server.url, backend=args.backend)
+            results["webhook_replay"] = {"cold": measure(server, replay_webhooks, client=client, directory=directory),
+                                         "warm": measure(server, replay_webhooks, client=client, directory=directory)}
+            print(f"webhook_replay: {json.dumps(results['webhook_replay'])}")
+
+    # Every comment of the dataset predates the recorded ones, and each run starts from a fresh dataset
+    if not args.only or "webhook_skipped_delivery" in args.only:
+        results["webhook_skipped_delivery"] = dict()
+        for run_name in ("cold", "warm"):
+            with FakeGithubProcess(latency=args.latency, repos=1, now=datetime(2026, 10, 1)) as server, \
+                    TemporaryDirectory() as directory:
+                client = GithubSummary(None, token="bench-0", base_url=server.url, backend=args.backend)
+                results["webhook_skipped_delivery"][run_name] = measure(server, replay_skipped_delivery,
+                                                                        client=client, github=server,
+                                                                        directory=directory)
+        print(f"webhook_skipped_delivery: {json.dumps(results['webhook_skipped_delivery'])}")
+
+    # Checked against the REST path, whatever backend the other runs use
+    if not args.only or "graphql_records" in args.only:
+        with FakeGithubProcess(latency=args.latency, **GRAPHQL_DATASET) as server:
+            client = GithubSummary(None, token="bench-0", base_url=server.url)
+            results["graphql_records"] = {"cold": measure(server, check_graphql_records, client=client),
+                                          "warm": measure(server, check_graphql_records, client=client)}
+            print(f"graphql_records: {json.dumps(results['graphql_records'])}")
+
+    return {"scale": vars(args), "results": results}
+
+
+def compare(report: dict, baseline: dict):
+    """Lists the commands that got slower or started asking GitHub for more"""
+    regressions = list()
+    for name, runs in report["results"].items():
+        for run_name, result in runs.items():
+            previous = baseline["results"].get(name, {}).get(run_name)
+            if not previous:
+                continue
+
+            if result["requests"] > previous["requests"]:
+                regressions.append(f"{name} ({run_name}): {previous['requests']} -> {result['requests']} requests")
+            if result["wall_time"] > previous["wall_time"] * (1 + TOLERANCE):
+                regressions.append(f"{name} ({run_name}): {previous['wall_time']}s -> {result['wall_time']}s")
+            if result["error"] and not previous["error"]:
+                regressions.append(f"{name} ({run_name}): {result['error']}")
+
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=5, help="Repositories in the organization")
+    parser.add_argument("--pulls", type=int, default=200, help="Pull requests per repository")
+    parser.add_argument("--issues", type=int, default=200, help="Issues per repository")
+    parser.add_argument("--comments", type=int, default=3, help="Average comments per issue")
+    parser.add_argument("--cards", type=int, default=50, help="Project cards")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", default=None, help="Backend passed to the client")
+    parser.add_argument("--report-cache-ttl", type=int, default=0, help="Report cache TTL, off like in the plugin")
+    parser.add_argument("--tokens", type=int, default=1, help="Tokens in the client's credential pool")
+    parser.add_argument("--only", nargs="*", help="Commands to run, all by default")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare the results with")
+    args = parser.parse_args()
+
+    problems = check_scenarios()
+    if problems:
+        parser.error("; ".join(problems))
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f))
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,11 +18,45 @@ def main():
     username = os.getenv("github_username")
     password = os.getenv("github_password")
     token = os.getenv("github_token")
+    backend = os.getenv("github_backend")
+    user_cache_file = os.getenv("github_user_cache_file")
+    http_cache_file = os.getenv("github_http_cache_file")
+    http_cache_size = int(os.getenv("github_http_cache_size") or 64)
+    max_concurrent_requests = int(os.getenv("github_max_concurrent_requests") or 10)
+    rate_limit_max_wait = int(os.getenv("github_rate_limit_max_wait") or 900)
+    body_limit = int(os.getenv("github_body_limit") or 0)
+    mirror_dir = os.getenv("github_mirror_dir")
+    ticket_store = os.getenv("github_ticket_store") or "json"
+    handle_cache_ttl = int(os.getenv("github_handle_cache_ttl") or 900)
+    perf_log = (os.getenv("github_perf_log") or "").lower() in ("1", "true", "yes")
+    base_url = os.getenv("github_base_url")
+    max_concurrent = int(os.getenv("github_max_concurrent") or 5)
+    webhook_port = int(os.getenv("github_webhook_port") or 0)
+    webhook_secret = os.getenv("github_webhook_secret")
+    webhook_dir = os.getenv("github_webhook_dir")
+    report_cache_size = int(os.getenv("github_report_cache_size") or 256)
+    report_cache_ttl = int(os.getenv("github_report_cache_ttl") or 0)
+    tokens = [value.strip() for value in (os.getenv("github_tokens") or "").split(",") if value.strip()]
+    app_id = os.getenv("github_app_id")
+    app_private_key = os.getenv("github_app_private_key")
+    app_installation_ids = [value.strip() for value in (os.getenv("github_app_installation_id") or "").split(",")
+                            if value.strip()]
+    checkpoint_dir = os.getenv("github_checkpoint_dir")
 
     Plugin(
-        GithubSummary(connection_params, username=username, password=password, token=token),
+        GithubSummary(connection_params, username=username, password=password, token=token, backend=backend,
+                      user_cache_file=user_cache_file, http_cache_file=http_cache_file,
+                      http_cache_size=http_cache_size, max_concurrent_requests=max_concurrent_requests,
+                      rate_limit_max_wait=rate_limit_max_wait, body_limit=body_limit,
+                      mirror_dir=mirror_dir, ticket_store=ticket_store, handle_cache_ttl=handle_cache_ttl,
+                      perf_log=perf_log, base_url=base_url, webhook_port=webhook_port,
+                      webhook_secret=webhook_secret, webhook_dir=webhook_dir,
+                      report_cache_size=report_cache_size, report_cache_ttl=report_cache_ttl, tokens=tokens,
+                      app_id=app_id, app_private_key=app_private_key, app_installation_ids=app_installation_ids,
+                      checkpoint_dir=checkpoint_dir),
         name="github-summary",
         version=__version__,
+        max_concurrent=max_concurrent,
         **connection_params
     ).run()
 
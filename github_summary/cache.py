@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import RLock
+import time
+
+
+class TTLCache:
+    """A thread safe mapping whose entries expire after `ttl` seconds, evicting the least recently used entry
+    once `maxsize` is reached"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or time.time() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, stored: float = None):
+        with self.lock:
+            self.entries[key] = (value, stored if stored is not None else time.time())
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def items(self):
+        """Returns (key, value, stored) for every entry, oldest first"""
+        with self.lock:
+            return [(key, value, stored) for key, (value, stored) in self.entries.items()]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,75 @@
+"""Progress of long running commands, kept on disk so a rerun continues where a failed run stopped"""
+from threading import Lock
+import json
+import os
+import time
+
+try:
+    from .ticket_store import write_atomic
+except:
+    from ticket_store import write_atomic
+
+
+class Checkpoint:
+    """Records the finished units of work of a command in an append-only JSON lines file
+
+    The first line names the arguments of the run. A checkpoint written for other arguments, or older than
+    `max_age` seconds, is discarded instead of resumed. `clear` removes the file once the command finished.
+    """
+
+    def __init__(self, path: str, arguments: dict, max_age: float = 24 * 3600):
+        self.path = path
+        self.arguments = json.loads(json.dumps(arguments, default=str))
+        self.lock = Lock()
+        self.results = dict()
+        self.started = time.time()
+
+        self.resume(max_age)
+
+        # Rewritten compactly, which also drops a line torn by a crash
+        lines = [{"arguments": self.arguments, "started": self.started}]
+        if self.results:
+            lines.append(self.results)
+        write_atomic(self.path, "".join(json.dumps(line) + "\n" for line in lines))
+
+    def resume(self, max_age: float):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as log:
+            lines = [line for line in log if line.strip()]
+
+        try:
+            header = json.loads(lines[0])
+            if header["arguments"] != self.arguments or time.time() - header["started"] > max_age:
+                return
+        except (IndexError, KeyError, TypeError, ValueError):
+            return
+
+        self.started = header["started"]
+        for line in lines[1:]:
+            try:
+                self.results.update(json.loads(line))
+            except ValueError:
+                pass
+
+    def __contains__(self, name: str):
+        return name in self.results
+
+    def get(self, name: str, default=None):
+        return self.results.get(name, default)
+
+    def record(self, results: dict):
+        """Durably adds finished work, one line per call"""
+        with self.lock:
+            with open(self.path, 'a') as log:
+                log.write(json.dumps(results) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+            self.results.update(results)
+
+    def clear(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.results = dict()
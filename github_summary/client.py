@@ -1,25 +1,536 @@
-from github import Github
+from github import Github, MainClass
+from github.Issue import Issue
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from inspect import signature
+from threading import Lock
 from brewtils import command, parameter, system
 import json
+import logging
 import os
+import time
+
+try:
+    from . import render, transport
+    from .cache import TTLCache
+    from .checkpoint import Checkpoint
+    from .credentials import POOL_TOKEN, build_pool
+    from .graphql_client import GraphQLClient
+    from .http_cache import MemoryResponseStore, SqliteResponseStore
+    from .metrics import PerformanceStats, cache_stats
+    from .mirror import ActivityMirror
+    from .ratelimit import RateLimitScheduler
+    from .records import split_url
+    from .ticket_store import open_ticket_store, ticket_key
+    from .users import user_cache
+    from .webhooks import WebhookProcessor, WebhookReceiver
+except:
+    import render
+    import transport
+    from cache import TTLCache
+    from checkpoint import Checkpoint
+    from credentials import POOL_TOKEN, build_pool
+    from graphql_client import GraphQLClient
+    from http_cache import MemoryResponseStore, SqliteResponseStore
+    from metrics import PerformanceStats, cache_stats
+    from mirror import ActivityMirror
+    from ratelimit import RateLimitScheduler
+    from records import split_url
+    from ticket_store import open_ticket_store, ticket_key
+    from users import user_cache
+    from webhooks import WebhookProcessor, WebhookReceiver
+
+logger = logging.getLogger(__name__)
+
+
+def metered(fn):
+    """Reports the GitHub requests spent by a command, once for the outermost command of a call"""
+
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+
+        with self.scheduler.track() as (counter, outermost):
+            try:
+                result = fn(self, *args, **kwargs)
+            finally:
+                if outermost:
+                    self.record_command(fn.__name__, counter, time.perf_counter() - started)
+
+        # Only HTML results carry the count, a JSON result keeps its shape and the count is only logged
+        if outermost and isinstance(result, str):
+            result += f"<!-- GitHub requests: {counter.requests}, not modified: {counter.not_modified} -->"
+
+        return result
+
+    return wrapper
+
+
+def memoized(fn):
+    """Answers repeated calls of a repo report from the report cache while the repo is unchanged
+
+    Results are keyed by the command, its arguments and the current time bucket. The command's `refresh` argument
+    bypasses the cache.
+    """
+    fn_signature = signature(fn)
+
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        arguments = fn_signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        arguments = {key: value for key, value in arguments.arguments.items() if key != "self"}
+        refresh = arguments.pop("refresh", False)
+
+        return self.get_report(fn.__name__, arguments, lambda: fn(self, *args, **kwargs), refresh)
+
+    return wrapper
 
 
 @system
 class GithubSummary:
     """A client that is designed to pull back summaries of Github Repos"""
 
-    def __init__(self, params, username: str = None, password: str = None, token: str = None):
+    # Results per page of every REST listing, the most GitHub serves (PyGithub asks for 30 by default)
+    page_size = 100
+
+    # How many synced tickets are written back to the ticket store at once
+    ticket_batch_size = 100
+
+    # Worker threads per pipeline stage; the scheduler still bounds the requests in flight
+    pipeline_workers = 8
+
+    # GitHub returns at most this many results for a search query
+    search_result_limit = 1000
+
+    # With webhooks pushing changes, the mirror only refreshes this often to reconcile missed deliveries
+    webhook_reconcile_interval = 3600
+
+    # Cached reports are bucketed by the hour so their rolling windows move on, and are served without asking
+    # GitHub whether the repo changed for this many seconds
+    report_bucket = 3600
+    report_check_interval = 60
 
-        if token:
-            self.g = Github(token)
+    def __init__(self, params, username: str = None, password: str = None, token: str = None,
+                 backend: str = None, user_cache_file: str = None, http_cache_file: str = None,
+                 http_cache_size: int = 64, max_concurrent_requests: int = 10, rate_limit_max_wait: int = 900,
+                 body_limit: int = None, mirror_dir: str = None, ticket_store: str = "json",
+                 handle_cache_size: int = 512, handle_cache_ttl: int = 900, perf_log: bool = False,
+                 base_url: str = None, webhook_port: int = None, webhook_secret: str = None,
+                 webhook_dir: str = None, report_cache_size: int = 256, report_cache_ttl: int = 0,
+                 tokens=None, app_id: int = None, app_private_key: str = None, app_installation_ids=None,
+                 checkpoint_dir: str = None):
+
+        self.scheduler = RateLimitScheduler(max_concurrent=max_concurrent_requests, max_wait=rate_limit_max_wait)
+        self.stats = PerformanceStats()
+        self.perf_log = perf_log
+
+        # Conditional requests answered with a 304 are served locally and do not count against the rate limit
+        if http_cache_file:
+            store = SqliteResponseStore(http_cache_file, max_bytes=http_cache_size * 1024 * 1024)
+        else:
+            store = MemoryResponseStore(max_bytes=http_cache_size * 1024 * 1024)
+
+        base_url = base_url.rstrip("/") if base_url else MainClass.DEFAULT_BASE_URL
+
+        # Extra tokens and GitHub App installations are pooled with the token, each with its own rate limit
+        self.credentials = None
+        if tokens or app_id:
+            pool = build_pool([token] + list(tokens if tokens else []), app_id, app_private_key,
+                              app_installation_ids if app_installation_ids else [], base_url)
+            self.credentials = pool if len(pool) else None
+
+        # Right before the client is built, which keeps these connection classes whatever clients come after
+        transport.install(store, self.scheduler, self.credentials)
+        if self.credentials:
+            self.g = Github(POOL_TOKEN, base_url=base_url, per_page=self.page_size)
+        elif token:
+            self.g = Github(token, base_url=base_url, per_page=self.page_size)
         elif username and password:
-            self.g = Github(username, password)
+            self.g = Github(username, password, base_url=base_url, per_page=self.page_size)
         else:
             # If username/password or Token is not provided, github allows for a limited query
             # of their API. Running this will most likely exceed that hourly rate.
-            self.g = Github()
+            self.g = Github(base_url=base_url, per_page=self.page_size)
+
+        # GraphQL does not allow anonymous access, so the REST objects remain the fallback
+        if backend == "graphql" and (token or self.credentials):
+            # GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+            graphql_url = f"{base_url[:-len('/v3')]}/graphql" if base_url.endswith("/api/v3") else f"{base_url}/graphql"
+            self.graphql = GraphQLClient(token, url=graphql_url, scheduler=self.scheduler,
+                                         credentials=self.credentials)
+        else:
+            self.graphql = None
+
+        self.users = user_cache
+        self.body_limit = body_limit
+        if user_cache_file:
+            self.users.persist(user_cache_file)
+
+        self.ticket_store = ticket_store
+        # One lock per ticket directory, held by the syncs and the webhook processor while they load and save it
+        self.directory_locks = dict()
+        # Repository, Organization and Project handles shared by every command and worker
+        self.handles = TTLCache(maxsize=handle_cache_size, ttl=handle_cache_ttl)
+        self.handle_locks = dict()
+        self.handle_locks_lock = Lock()
+
+        # Where the org summaries keep their progress, the ticket syncs keep theirs in the ticket directory
+        self.checkpoint_dir = checkpoint_dir
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        # Rendered repo reports, revalidated against the repo's updated_at / pushed_at
+        self.reports = TTLCache(maxsize=report_cache_size, ttl=report_cache_ttl) if report_cache_ttl else None
+
+        # Reports read from the local mirror, which only asks GitHub for what changed since the last refresh
+        if mirror_dir:
+            self.mirror = ActivityMirror(mirror_dir, display_name=self.users.display_name)
+        else:
+            self.mirror = None
+
+        # Deliveries pushed by GitHub keep the ticket directory and the mirror current between syncs
+        self.webhooks = WebhookProcessor(self, webhook_dir)
+        if webhook_port:
+            self.webhook_receiver = WebhookReceiver(self.webhooks, webhook_port, webhook_secret).start()
+            if self.mirror:
+                self.mirror.refresh_interval = self.webhook_reconcile_interval
+        else:
+            self.webhook_receiver = None
+
+    def record_command(self, name: str, counter, wall_time: float):
+        report = self.stats.add(name, counter, wall_time)
+
+        if self.perf_log:
+            logger.info(json.dumps(dict(report, command=name, wall_time=round(wall_time, 3))))
+        else:
+            logger.info(f"{name} spent {counter.requests} GitHub requests "
+                        f"({counter.not_modified} answered as not modified) in {wall_time:.1f}s")
+
+    def get_handle(self, key: str, load):
+        """Returns the cached handle for `key`, calling `load` once on a miss even with concurrent workers"""
+        handle = self.handles.get(key)
+        if handle is not None:
+            return handle
+
+        with self.handle_locks_lock:
+            lock = self.handle_locks.setdefault(key, Lock())
+
+        with lock:
+            handle = self.handles.get(key)
+            if handle is None:
+                handle = load()
+                self.handles.set(key, handle)
+            return handle
+
+    def get_repo(self, organization: str, repo_name: str):
+        return self.get_handle(f'repo:{organization}/{repo_name}',
+                               lambda: self.g.get_repo(f'{organization}/{repo_name}'))
+
+    def get_organization(self, organization: str):
+        return self.get_handle(f'organization:{organization}', lambda: self.g.get_organization(organization))
+
+    def get_projects(self, organization: str, repo_name: str = ''):
+        """Returns the projects of an organization, or of one of its repos"""
+        if repo_name:
+            return self.get_handle(f'projects:{organization}/{repo_name}',
+                                   lambda: list(self.get_repo(organization, repo_name).get_projects()))
+
+        return self.get_handle(f'projects:{organization}',
+                               lambda: list(self.get_organization(organization).get_projects()))
+
+    def pipeline(self, fn, items, workers: int = None):
+        """Calls `fn` on every item from worker threads and returns the results in order
+
+        The requests of the workers are charged to the calling command.
+        """
+        workers = max(workers if workers else self.pipeline_workers, 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.scheduler.bind(self.scheduler.current(), fn), items))
+
+    def get_report(self, name: str, arguments: dict, run, refresh: bool = False):
+        """Returns the cached result of a repo report, or runs it
+
+        A cached result older than `report_check_interval` is only served after a conditional request shows the
+        repo's updated_at and pushed_at have not moved.
+        """
+        if self.reports is None:
+            return run()
+
+        full_name = f'{arguments["organization"]}/{arguments["repoName"]}'
+        key = (name, json.dumps(arguments, sort_keys=True, default=str), int(time.time() // self.report_bucket))
+
+        entry = None if refresh else self.reports.get(key)
+        if entry is not None:
+            if time.time() - entry["checked"] < self.report_check_interval:
+                return entry["result"]
+
+            version = self.get_repo_version(full_name)
+            if version == entry["version"]:
+                entry["checked"] = time.time()
+                return entry["result"]
+
+        version = self.get_repo_version(full_name)
+        result = run()
+        self.reports.set(key, {"repo": full_name, "version": version, "checked": time.time(), "result": result})
+
+        return result
+
+    def get_repo_version(self, full_name: str):
+        """Fetches the repo again (a free 304 while it is unchanged) and returns its updated_at and pushed_at"""
+        repo = self.g.get_repo(full_name)
+        self.handles.set(f'repo:{full_name}', repo)
+        return repo.updated_at, repo.pushed_at
+
+    def invalidate_reports(self, full_name: str):
+        """Drops the cached reports of a repo"""
+        if self.reports is None:
+            return
+
+        for key, entry, stored in self.reports.items():
+            if entry["repo"] == full_name:
+                self.reports.pop(key)
+
+    def open_ticket_store(self, directory: str):
+        return open_ticket_store(directory, self.ticket_store)
+
+    def directory_lock(self, directory: str):
+        """Returns the lock shared by everything that loads and saves the tickets of `directory`"""
+        with self.handle_locks_lock:
+            return self.directory_locks.setdefault(os.path.realpath(directory), Lock())
+
+    def get_issue_if_modified(self, repo, issue_number: int, last_modified: str = None):
+        """Fetches an issue with If-Modified-Since, returning None when GitHub answers 304 Not Modified
+
+        GitHub does not count 304 responses against the rate limit.
+        """
+        headers = {"If-Modified-Since": last_modified} if last_modified and last_modified != "None" else {}
+
+        response_headers, data = repo._requester.requestJsonAndCheck("GET", f"{repo.url}/issues/{int(issue_number)}",
+                                                                     headers=headers)
+        if not data:
+            return None
+
+        return Issue(repo._requester, response_headers, data, completed=True)
+
+    def get_window_pulls(self, repo, state: str, since: datetime, base: str):
+        """Yields the PRs updated since the given date, stopping at the first PR outside of the window"""
+        if self.mirror:
+            self.mirror.refresh(repo)
+            yield from self.mirror.get_pulls(repo.full_name, state, since, base)
+            return
+
+        if self.graphql:
+            yield from self.graphql.get_pulls(repo.full_name, state, since, base)
+            return
+
+        pulls = repo.get_pulls(state=state, sort='updated', direction='desc', base=base)
+
+        for pr in pulls:
+            if pr.updated_at < since:
+                break
+            yield pr
 
+    def get_window_issues(self, repo, state: str, since: datetime):
+        """Yields the issues (not PRs) updated since the given date, stopping at the first issue outside of the
+        window"""
+        if self.mirror:
+            self.mirror.refresh(repo)
+            yield from self.mirror.get_issues(repo.full_name, state, since)
+            return
+
+        if self.graphql:
+            yield from self.graphql.get_issues(repo.full_name, state, since)
+            return
+
+        issues = repo.get_issues(state=state, since=since, sort='updated', direction='desc')
+
+        for issue in issues:
+            if issue.updated_at < since:
+                break
+
+            # The issues endpoint also returns pull requests
+            if issue.pull_request:
+                continue
+
+            yield issue
+
+    def get_closed_issue_links(self, repo, since: datetime):
+        """Yields each issue closed since the given date with the numbers of the PRs linked to it
+
+        GraphQL returns the closing PRs with the issues; over REST the issue timeline is read for the
+        cross-referenced PRs, one request per issue (once per issue update when mirrored), several at a time.
+        """
+        if self.graphql and not self.mirror:
+            yield from self.graphql.get_closed_issue_links(repo.full_name, since)
+            return
+
+        def links_for(issue):
+            if not self.mirror:
+                return self.get_timeline_links(issue)
+
+            links = self.mirror.get_links(repo.full_name, issue.number, issue.updated_at)
+            if links is None:
+                links = self.get_timeline_links(repo.get_issue(issue.number))
+                self.mirror.save_links(repo.full_name, issue.number, issue.updated_at, links)
+            return links
+
+        issues = [issue for issue in self.get_window_issues(repo, 'closed', since) if issue.closed_at >= since]
+
+        yield from zip(issues, self.pipeline(links_for, issues))
+
+    def get_timeline_links(self, issue):
+        return [event.source.issue.number for event in issue.get_timeline()
+                if event.event == "cross-referenced" and event.source and event.source.issue]
+
+    def load_project_board(self, projects_pages):
+        """Walks the projects, columns and cards, then resolves the card issues in bulk per repo
+
+        Columns, cards and repos are each read concurrently. Yields (project, column, repo name, issue) in board
+        order. Note cards have no issue and are skipped.
+        """
+        projects = list(projects_pages)
+        columns = [(project, column) for project, project_columns
+                   in zip(projects, self.pipeline(lambda project: list(project.get_columns()), projects))
+                   for column in project_columns]
+
+        cards = list()
+        wanted = dict()
+        for (project, column), column_cards in zip(columns, self.pipeline(lambda pair: list(pair[1].get_cards()),
+                                                                          columns)):
+            for card in column_cards:
+                if card.content_url is None:
+                    continue
+
+                organization, repo_name, number = split_url(card.content_url)
+                cards.append((project.name, column.name, organization, repo_name, number))
+                wanted.setdefault((organization, repo_name), set()).add(number)
+
+        def prefetch(key):
+            return list(self.prefetch_issues(self.get_repo(*key), wanted[key]))
+
+        issues = dict()
+        for (organization, repo_name), repo_issues in zip(wanted, self.pipeline(prefetch, list(wanted))):
+            for issue in repo_issues:
+                issues[(organization, repo_name, issue.number)] = issue
+
+        for project_name, column_name, organization, repo_name, number in cards:
+            yield project_name, column_name, repo_name, issues[(organization, repo_name, number)]
+
+    def prefetch_issues(self, repo, numbers: set):
+        """Yields the given issues (or PRs) of a repo with as few requests as possible
+
+        The mirror answers locally. Otherwise the issue listing (most recently updated first) is read until every
+        number is found, switching to single lookups for the rest once that is cheaper.
+        """
+        missing = set(numbers)
+
+        if self.mirror:
+            self.mirror.refresh(repo)
+            for number in sorted(missing):
+                issue = self.mirror.get_issue(repo.full_name, number)
+                if issue is not None:
+                    missing.discard(number)
+                    yield issue
+        else:
+            for seen, issue in enumerate(repo.get_issues(state='all', sort='updated', direction='desc')):
+                if issue.number in missing:
+                    missing.discard(issue.number)
+                    yield issue
+
+                # The pages read so far outnumber the single lookups still needed
+                if not missing or seen // self.g.per_page >= len(missing):
+                    break
+
+        for number in sorted(missing):
+            yield repo.get_issue(number)
+
+    def render_pr(self, organization: str, repoName: str, pr):
+        return render.pr(organization, repoName, pr, self.users.display_name(pr.user), self.body_limit)
+
+    def render_issue(self, organization: str, repoName: str, issue):
+        return render.issue(organization, repoName, issue, self.users.display_name(issue.user), self.body_limit)
+
+    def collect_repo_summary(self, repo, organization: str, repoName: str, days: int, base: str):
+        """Fetches the PR and issue streams for the window once and splits them into the summary sections"""
+        now = datetime.now()
+        since = now - timedelta(days=days)
+
+        sections = {"open_prs": [], "closed_prs": [], "opened_tickets": [], "closed_tickets": []}
+
+        for pr in self.get_window_pulls(repo, 'all', since, base):
+            if pr.updated_at <= now and not pr.user.login.endswith("-bot"):
+                if pr.state == 'open':
+                    sections["open_prs"].append(self.render_pr(organization, repoName, pr))
+                else:
+                    sections["closed_prs"].append(self.render_pr(organization, repoName, pr))
+
+        for issue in self.get_window_issues(repo, 'all', since):
+            if issue.user.login.endswith("-bot"):
+                continue
+
+            if issue.state == 'open' and since <= issue.created_at <= now:
+                sections["opened_tickets"].append(self.render_issue(organization, repoName, issue))
+            elif issue.state == 'closed' and since <= issue.closed_at <= now:
+                sections["closed_tickets"].append(self.render_issue(organization, repoName, issue))
+
+        return sections
+
+    def search_organization_summary(self, organization: str, days: int, base: str):
+        """Builds the summary sections of every repo with activity in the window from three org wide searches
+
+        Repos without activity cost no request at all. Returns None when a search hits the result limit of the
+        search API, as the summary would be incomplete.
+        """
+        now = datetime.now()
+        since = now - timedelta(days=days)
+        date = since.date().isoformat()
+
+        queries = {"prs": f"org:{organization} is:pr updated:>={date} base:{base}",
+                   "opened_tickets": f"org:{organization} is:issue is:open created:>={date}",
+                   "closed_tickets": f"org:{organization} is:issue is:closed closed:>={date}"}
+
+        # The first page of every search carries its total_count, so a search over the result limit is given up
+        # before any of them is paginated
+        searches = {key: self.g.search_issues(query, sort='updated', order='desc') for key, query in queries.items()}
+        pages = {key: iter(found) for key, found in searches.items()}
+        first = {key: next(page, None) for key, page in pages.items()}
+
+        for key, found in searches.items():
+            if first[key] is not None and found.totalCount > self.search_result_limit:
+                logger.warning(f"Search '{queries[key]}' matched {found.totalCount} results, more than the "
+                               f"{self.search_result_limit} the search API returns")
+                return None
+
+        results = {key: ([first[key]] if first[key] is not None else []) + list(pages[key]) for key in searches}
+
+        summaries = dict()
+
+        def sections(item):
+            _, repo_name, _ = split_url(item.url)
+            return repo_name, summaries.setdefault(repo_name, {"open_prs": [], "closed_prs": [],
+                                                               "opened_tickets": [], "closed_tickets": []})
+
+        for pr in results["prs"]:
+            if since <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
+                repo_name, repo_sections = sections(pr)
+                key = "open_prs" if pr.state == 'open' else "closed_prs"
+                repo_sections[key].append(self.render_pr(organization, repo_name, pr))
+
+        for issue in results["opened_tickets"]:
+            if since <= issue.created_at <= now and not issue.user.login.endswith("-bot"):
+                repo_name, repo_sections = sections(issue)
+                repo_sections["opened_tickets"].append(self.render_issue(organization, repo_name, issue))
+
+        for issue in results["closed_tickets"]:
+            if since <= issue.closed_at <= now and not issue.user.login.endswith("-bot"):
+                repo_name, repo_sections = sections(issue)
+                repo_sections["closed_tickets"].append(self.render_issue(organization, repo_name, issue))
+
+        return summaries
+
+    @metered
     @command(output_type="HTML", description="Create summary PRs created/modified in date range")
     @parameter(
         key="organization",
@@ -48,21 +559,16 @@ class GithubSummary:
         default="master",
     )
     def get_latest_active_prs(self, organization: str, repoName: str, days: int = 30, base: str = "master"):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
-
-        pulls = repo.get_pulls(state='open', sort='created', base=base)
+        repo = self.get_repo(organization, repoName)
 
         now = datetime.now()
 
-        response = ""
-        for pr in pulls:
-            if now - timedelta(days=days) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
-                response += f"<h3>{organization}/{repoName}#{pr.number} {pr.title}</h3>" \
-                            f"<i>Created: {pr.user.name if pr.user.name else pr.user.login} </i><br>" \
-                            f"{pr.body}<br>"
+        pulls = self.get_window_pulls(repo, 'open', now - timedelta(days=days), base)
 
-        return response
+        return "".join(self.render_pr(organization, repoName, pr) for pr in pulls
+                       if pr.updated_at <= now and not pr.user.login.endswith("-bot"))
 
+    @metered
     @command(output_type="HTML", description="Create summary PRs closed in date range")
     @parameter(
         key="organization",
@@ -91,21 +597,16 @@ class GithubSummary:
         default="master",
     )
     def get_latest_closed_prs(self, organization: str, repoName: str, days: int = 14, base: str = "master"):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
-
-        pulls = repo.get_pulls(state='closed', sort='created', base=base)
+        repo = self.get_repo(organization, repoName)
 
         now = datetime.now()
 
-        response = ""
-        for pr in pulls:
-            if now - timedelta(days=days) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
-                response += f"<h3>{organization}/{repoName}#{pr.number} {pr.title}</h3>" \
-                            f"<i>Created:{pr.user.name if pr.user.name else pr.user.login} </i><br>" \
-                            f"{pr.body}<br>"
+        pulls = self.get_window_pulls(repo, 'closed', now - timedelta(days=days), base)
 
-        return response
+        return "".join(self.render_pr(organization, repoName, pr) for pr in pulls
+                       if pr.updated_at <= now and not pr.user.login.endswith("-bot"))
 
+    @metered
     @command(output_type="HTML", description="Attempts to generate a change log")
     @parameter(
         key="organization",
@@ -133,68 +634,46 @@ class GithubSummary:
     )
     def generate_change_log(self, organization: str, repoName: str, merge_date: int = None, base: str = "master"):
         # We are going to use the PRs that are merged against the branch
-        repo = self.g.get_repo(f'{organization}/{repoName}')
+        repo = self.get_repo(organization, repoName)
 
-        pulls = repo.get_pulls(state='closed', sort='created', base=base)
+        since = datetime.fromtimestamp(merge_date / 1000.0)
 
-        merge_date = merge_date / 1000.0
-
-        #issues = repo.get_issues(since=datetime.fromtimestamp(merge_date))
+        now = datetime.now()
 
-        issues = repo.get_issues(state='closed')
+        # The merged PRs and the closed issues are independent, so both streams are read side by side and
+        # joined in memory
+        pulls, closed_issues = self.pipeline(list, [self.get_window_pulls(repo, 'closed', since, base),
+                                                    self.get_closed_issue_links(repo, since)], workers=2)
 
-        now = datetime.now()
+        merged = [pr for pr in pulls if pr.merged_at and pr.base.ref == base]
+        merged_numbers = set(pr.number for pr in merged)
 
         bugs = list()
         features = list()
-        prs_linked = list()
-
-        for issue in issues:
-            if issue.closed_at >= datetime.fromtimestamp(merge_date):
-                for event in issue.get_timeline():
-                    if event.event == "cross-referenced":
-                        if event.source and event.source.issue and event.source.issue.number:
-                            link_id = event.source.issue.number
-
-                            try:
-                                print(f"Compare Issue #{issue.number} to PR #{link_id}")
-                                pr = repo.get_pull(link_id)
-                                prs_linked.append(link_id)
-
-                                if pr.state == "closed" and pr.is_merged() and pr.base.ref == base:
+        prs_linked = set()
 
-                                    not_bug = True
-                                    for label in issue.get_labels():
-                                        if label.name.lower() == "bug":
-                                            bugs.append(f"<br>- {issue.title} (Issue #{issue.number} / PR #{link_id})")
-                                            not_bug = False
-                                            break
-                                    if not_bug:
-                                        features.append(f"<br>- {issue.title} (Issue #{issue.number} / PR #{link_id})")
+        for issue, links in closed_issues:
+            link_id = next((number for number in links if number in merged_numbers), None)
+            if link_id is None:
+                continue
 
-                                break
+            prs_linked.add(link_id)
 
-                            except:
-                                pass
+            entry = f"<br>- {issue.title} (Issue #{issue.number} / PR #{link_id})"
+            if any(label.name.lower() == "bug" for label in issue.labels):
+                bugs.append(entry)
+            else:
+                features.append(entry)
 
-        for pr in pulls:
-            if datetime.fromtimestamp(merge_date) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
-                if pr.number not in prs_linked and pr.is_merged():
+        for pr in merged:
+            if pr.updated_at <= now and not pr.user.login.endswith("-bot"):
+                if pr.number not in prs_linked:
                     features.append(f"<br>- {pr.title} (PR #{pr.number})")
 
-        output = ""
-        if len(bugs) > 0:
-            output += "<br>#### Bug Fixes"
-            for bug in bugs:
-                output += bug
-
-        if len(features) > 0:
-            output += "<br><br>#### Added Features"
-            for feature in features:
-                output += feature
-
-        return output
+        return "".join(render.change_log(bugs, features))
 
+    @metered
+    @memoized
     @command(output_type="HTML", description="Grabs PRs in date range and provides open/closed data")
     @parameter(
         key="organization",
@@ -222,35 +701,56 @@ class GithubSummary:
         type="String",
         default="master",
     )
-    def get_pr_open_closed(self, organization: str, repoName: str, days: int, base: str, ):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
-
-        pulls = repo.get_pulls(state='closed', sort='created', base=base)
+    @parameter(
+        key="refresh",
+        description="Ignore any cached report",
+        optional=True,
+        type="Boolean",
+        default=False,
+    )
+    def get_pr_open_closed(self, organization: str, repoName: str, days: int, base: str, refresh: bool = False):
+        repo = self.get_repo(organization, repoName)
 
         now = datetime.now()
 
-        response = "<table><th><td>PR</td><td>Developer</td><td>Open Date</td><td>Closed Date<td><th>"
-        for pr in pulls:
-            if now - timedelta(days=days) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
-                response += f"<tr><td>{organization}/{repoName}#{pr.number} {pr.title}</td>" \
-                            f"<td>{pr.user.name if pr.user.name else pr.user.login} </td>" \
-                            f"<td>{pr.created_at}</td>" \
-                            f"<td>{pr.merged_at}</td></tr>"
+        pulls = self.get_window_pulls(repo, 'closed', now - timedelta(days=days), base)
+
+        rows = ((pr, self.users.display_name(pr.user)) for pr in pulls
+                if pr.updated_at <= now and not pr.user.login.endswith("-bot"))
 
-        response += "</table>"
-        return response
+        return "".join(render.pr_table(organization, repoName, rows))
 
     def generate_timestamp(self, date: datetime):
         return f"{date.isocalendar()[0]}-W{date.isocalendar()[1]}"
 
     def get_week_start(self, date: datetime):
+        return f"{(date - timedelta(days=date.weekday())).date().isoformat()}"
 
-        week = f"{date.isocalendar()[0]}-W{date.isocalendar()[1]}"
+    def collect_pr_weekly_metrics(self, repo, days: int, base: str):
+        """Counts the PRs created and merged per ISO week of the window in a single pass, oldest week first"""
+        now = datetime.now()
+        since = now - timedelta(days=days)
+
+        stats = {}
+        week = since - timedelta(days=since.weekday())
+        while week <= now:
+            stats[self.generate_timestamp(week)] = {"created": 0, "merged": 0, "date": self.get_week_start(week)}
+            week += timedelta(weeks=1)
 
-        r = datetime.strptime(week + '-1', "%Y-W%W-%w")
+        for pr in self.get_window_pulls(repo, 'all', since, base):
+            if pr.updated_at > now or pr.user.login.endswith("-bot"):
+                continue
 
-        return f"{r.date().isoformat()}"
+            if since <= pr.created_at <= now:
+                stats[self.generate_timestamp(pr.created_at)]['created'] += 1
 
+            if pr.merged_at and since <= pr.merged_at <= now:
+                stats[self.generate_timestamp(pr.merged_at)]['merged'] += 1
+
+        return stats
+
+    @metered
+    @memoized
     @command(output_type="HTML", description="Grabs PRs in date range and provides open/closed data")
     @parameter(
         key="organization",
@@ -278,82 +778,57 @@ class GithubSummary:
         type="String",
         default="master",
     )
-    def get_pr_daily_metrics(self, organization: str, repoName: str, days: int, base: str, ):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
-
-        closedPulls = repo.get_pulls(state='closed', sort='created', base=base)
-
-        openPulls = repo.get_pulls(state='closed', sort='created', base=base)
+    @parameter(
+        key="refresh",
+        description="Ignore any cached report",
+        optional=True,
+        type="Boolean",
+        default=False,
+    )
+    def get_pr_daily_metrics(self, organization: str, repoName: str, days: int, base: str, refresh: bool = False):
+        repo = self.get_repo(organization, repoName)
 
-        now = datetime.now()
+        stats = self.collect_pr_weekly_metrics(repo, days, base)
 
-        stats = {}
+        return "".join(render.metrics_table(stats))
 
-        for pr in closedPulls:
-            if now - timedelta(days=days) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
+    @metered
+    @command(output_type="JSON", description="Grabs PRs in date range and provides weekly open/closed data as JSON")
+    @parameter(
+        key="organization",
+        description="Github Organization",
+        optional=False,
+        type="String",
+    )
+    @parameter(
+        key="repoName",
+        description="Github Repo Name",
+        optional=False,
+        type="String",
+    )
+    @parameter(
+        key="days",
+        description="How many days back to query",
+        optional=True,
+        type="Integer",
+        default=30,
+    )
+    @parameter(
+        key="base",
+        description="Branch",
+        optional=True,
+        type="String",
+        default="master",
+    )
+    def get_pr_daily_metrics_json(self, organization: str, repoName: str, days: int = 30, base: str = "master"):
+        repo = self.get_repo(organization, repoName)
 
-                created = self.generate_timestamp(pr.created_at)
+        stats = self.collect_pr_weekly_metrics(repo, days, base)
 
-                if created in stats:
-                    stats[created]['created'] = stats[created]['created'] + 1
-                else:
-                    stats[created] = {}
-                    stats[created]['created'] = 1
-                    stats[created]['merged'] = 0
-                    stats[created]['date'] = self.get_week_start(pr.created_at)
-
-                if pr.merged_at:
-                    merged = self.generate_timestamp(pr.merged_at)
-                    if merged in stats:
-                        stats[merged]['merged'] = stats[merged]['merged'] + 1
-                    else:
-                        stats[merged] = {}
-                        stats[merged]['created'] = 0
-                        stats[merged]['merged'] = 1
-                        stats[merged]['date'] = self.get_week_start(pr.merged_at)
-
-        for pr in openPulls:
-            if now - timedelta(days=days) <= pr.updated_at <= now and not pr.user.login.endswith("-bot"):
-
-                created = self.generate_timestamp(pr.created_at)
-
-                if created in stats:
-                    stats[created]['created'] = stats[created]['created'] + 1
-                else:
-                    stats[created] = {}
-                    stats[created]['created'] = 1
-                    stats[created]['merged'] = 0
-                    stats[created]['date'] = self.get_week_start(pr.created_at)
-
-                if pr.merged_at:
-                    merged = self.generate_timestamp(pr.merged_at)
-                    if merged in stats:
-                        stats[merged]['merged'] = stats[merged]['merged'] + 1
-                    else:
-                        stats[merged] = {}
-                        stats[merged]['created'] = 0
-                        stats[merged]['merged'] = 1
-                        stats[merged]['date'] = self.get_week_start(pr.merged_at)
-
-        # print(stats)
-        response = "<table>" \
-                   "<tr>" \
-                   "<td>Week</td>" \
-                   "<td>Date</td>" \
-                   "<td>Total Open</td>" \
-                   "<td>Total Closed</td>" \
-                   "<tr>"
-
-        for day in stats:
-            response += "<tr>"
-            response += f"<td>{day}</td>"
-            response += f"<td>{stats[day]['date']}</td>"
-            response += f"<td>{stats[day]['created']}</td>"
-            response += f"<td>{stats[day]['merged']}</td>"
-            response += "</tr>"
-        response += "</table>"
-        return response
+        return [{"week": week, "date": stats[week]["date"], "created": stats[week]["created"],
+                 "merged": stats[week]["merged"]} for week in stats]
 
+    @metered
     @command(output_type="HTML", description="Create summary tickets created in date range")
     @parameter(
         key="organization",
@@ -375,21 +850,16 @@ class GithubSummary:
         default=30,
     )
     def get_latest_created_tickets(self, organization: str, repoName: str, days: int = 14):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
+        repo = self.get_repo(organization, repoName)
 
-        open_issues = repo.get_issues(state='open')
         now = datetime.now()
+        open_issues = self.get_window_issues(repo, 'open', now - timedelta(days=days))
 
-        response = ""
-        for issue in open_issues:
-            if now - timedelta(days=days) <= issue.created_at <= now and not issue.user.login.endswith("-bot"):
-                response += f"<h3>{organization}/{repoName}#{issue.number} {issue.title}</h3>" \
-                            f"<i>Created: {issue.user.name if issue.user.name else issue.user.login} </i><br>" \
-                            f"<i>Assigned: {issue.assignee.login if issue.assignee else ''} </i><br>" \
-                            f"{issue.body}<br>"
-
-        return response
+        return "".join(self.render_issue(organization, repoName, issue) for issue in open_issues
+                       if now - timedelta(days=days) <= issue.created_at <= now
+                       and not issue.user.login.endswith("-bot"))
 
+    @metered
     @command(output_type="HTML", description="Create summary tickets closed in date range")
     @parameter(
         key="organization",
@@ -411,21 +881,45 @@ class GithubSummary:
         default=30,
     )
     def get_latest_closed_tickets(self, organization: str, repoName: str, days: int = 14):
-        repo = self.g.get_repo(f'{organization}/{repoName}')
+        repo = self.get_repo(organization, repoName)
 
-        open_issues = repo.get_issues(state='closed')
         now = datetime.now()
+        open_issues = self.get_window_issues(repo, 'closed', now - timedelta(days=days))
+
+        return "".join(self.render_issue(organization, repoName, issue) for issue in open_issues
+                       if now - timedelta(days=days) <= issue.closed_at <= now
+                       and not issue.user.login.endswith("-bot"))
 
-        response = ""
-        for issue in open_issues:
-            if now - timedelta(days=days) <= issue.closed_at <= now and not issue.user.login.endswith("-bot"):
-                response += f"<h3>{organization}/{repoName}#{issue.number} {issue.title}</h3>" \
-                            f"<i>Created: {issue.user.name if issue.user.name else issue.user.login} </i><br>" \
-                            f"<i>Assigned: {issue.assignee.login if issue.assignee else ''} </i><br>" \
-                            f"{issue.body}<br>"
+    @command(output_type="JSON", description="Request counts, pages, latency and cache hit rates per command")
+    @parameter(
+        key="reset",
+        description="Clear the collected statistics after returning them",
+        optional=True,
+        type="Boolean",
+        default=False,
+    )
+    def get_performance_stats(self, reset: bool = False):
+        stats = {
+            "commands": self.stats.to_dict(),
+            "caches": {
+                "users": cache_stats(self.users),
+                "handles": cache_stats(self.handles),
+            },
+            "rate_limit": self.scheduler.report(),
+        }
 
-        return response
+        if self.reports is not None:
+            stats["caches"]["reports"] = cache_stats(self.reports)
 
+        if self.credentials is not None:
+            stats["credentials"] = self.credentials.report()
+
+        if reset:
+            self.stats.reset()
+
+        return stats
+
+    @metered
     @command(output_type="JSON", description="List of all Repos in an Organization")
     @parameter(
         key="organization",
@@ -434,7 +928,7 @@ class GithubSummary:
         type="String",
     )
     def get_repos_by_organization(self, organization):
-        organization = self.g.get_organization(organization)
+        organization = self.get_organization(organization)
         repos = organization.get_repos()
 
         repo_names = list()
@@ -443,6 +937,8 @@ class GithubSummary:
 
         return repo_names
 
+    @metered
+    @memoized
     @command(output_type="HTML", description="Create summary for a single Repo")
     @parameter(
         key="organization",
@@ -470,34 +966,22 @@ class GithubSummary:
         type="String",
         default="master",
     )
-    def get_repo_summary(self, organization: str, repoName: str, days: int = 14, base: str = "master"):
-
-        open_prs = self.get_latest_active_prs(organization, repoName, days=days, base=base)
-        closed_prs = self.get_latest_closed_prs(organization, repoName, days=days, base=base)
-        opened_tickets = self.get_latest_created_tickets(organization, repoName, days=days)
-        closed_tickets = self.get_latest_closed_tickets(organization, repoName, days=days)
-
-        if open_prs or closed_prs or opened_tickets or closed_tickets:
-            response = f"<h1>Summary for {organization}/{repoName}</h1>"
-
-            if open_prs:
-                response += f"<h2>Open PRs</h2>" \
-                            f"{open_prs}"
-            if closed_prs:
-                response += f"<h2>Closed PRs</h2>" \
-                            f"{closed_prs}"
-            if opened_tickets:
-                response += f"<h2>Open Tickets</h2>" \
-                            f"{opened_tickets}"
+    @parameter(
+        key="refresh",
+        description="Ignore any cached report",
+        optional=True,
+        type="Boolean",
+        default=False,
+    )
+    def get_repo_summary(self, organization: str, repoName: str, days: int = 14, base: str = "master",
+                         refresh: bool = False):
+        repo = self.get_repo(organization, repoName)
 
-            if closed_tickets:
-                response += f"<h2>Closed Tickets</h2>" \
-                            f"{closed_tickets}"
+        sections = self.collect_repo_summary(repo, organization, repoName, days, base)
 
-            return response
-        else:
-            return ""
+        return "".join(render.repo_summary(organization, repoName, sections))
 
+    @metered
     @command(output_type="HTML", description="Create summary for all repos in an organization")
     @parameter(
         key="organization",
@@ -519,14 +1003,64 @@ class GithubSummary:
         type="String",
         default="master",
     )
-    def get_organization_summary(self, organization, days: int = 14, base: str = "master"):
+    @parameter(
+        key="workers",
+        description="How many repos to summarize concurrently",
+        optional=True,
+        type="Integer",
+        default=4,
+    )
+    @parameter(
+        key="mode",
+        description="listing reads every repo, search runs a few org wide searches so idle repos cost nothing",
+        optional=True,
+        type="String",
+        default="listing",
+        choices=["listing", "search"],
+    )
+    def get_organization_summary(self, organization, days: int = 14, base: str = "master", workers: int = 4,
+                                 mode: str = "listing"):
+
+        if mode == "search":
+            summaries = self.search_organization_summary(organization, days, base)
+
+            # Past the search result limit the repos are listed instead
+            if summaries is not None:
+                return "".join(fragment for repo_name in sorted(summaries)
+                               for fragment in render.repo_summary(organization, repo_name, summaries[repo_name]))
+
+        # The repo listing and every finished repo summary are checkpointed, a rerun after a failure only
+        # summarizes the repos that are left
+        checkpoint = None
+        if self.checkpoint_dir:
+            checkpoint = Checkpoint(os.path.join(self.checkpoint_dir, f"organization-{organization}.checkpoint"),
+                                    {"organization": organization, "days": days, "base": base},
+                                    max_age=self.report_bucket)
+
+        def summarize(repo_name):
+            if checkpoint is not None and f"repo:{repo_name}" in checkpoint:
+                return checkpoint.get(f"repo:{repo_name}")
+
+            summary = self.get_repo_summary(organization, repo_name, days=days, base=base)
+            if checkpoint is not None:
+                checkpoint.record({f"repo:{repo_name}": summary})
+            return summary
+
+        if checkpoint is not None and "repos" in checkpoint:
+            repos = checkpoint.get("repos")
+        else:
+            repos = self.get_repos_by_organization(organization)
+            if checkpoint is not None:
+                checkpoint.record({"repos": repos})
 
-        response = ""
-        for repo in self.get_repos_by_organization(organization):
-            response += self.get_repo_summary(organization, repo, days=days, base=base)
+        # Results keep the order of the repo listing, the scheduler paces the workers
+        summary = "".join(self.pipeline(summarize, repos, workers=workers))
 
-        return response
+        if checkpoint is not None:
+            checkpoint.clear()
+        return summary
 
+    @metered
     @command(output_type="HTML",
              description="Create summary for all Projects in an organization (or organization/repo)")
     @parameter(
@@ -544,49 +1078,15 @@ class GithubSummary:
     )
     def get_projects_issues_summary(self, organization, repo: str = None):
 
-        organization = self.g.get_organization(organization)
-        projects = []
-        if repo != '':
-            repos = organization.get_repo(repo)
-            projects_pages = repos.get_projects()
-        else:
-            projects_pages = organization.get_projects()
-
-        result = '<table datatable="ng"' \
-                 '       dt-options="dtOptions"' \
-                 '       class="table table-striped table-bordered"' \
-                 '       style="width: 100%">' \
-                 '  <thead>' \
-                 '    <tr>' \
-                 '      <th scope="col">Organization</th>' \
-                 '      <th scope="col">Project</th>' \
-                 '      <th scope="col">Status</th>' \
-                 '      <th scope="col">Issue #</th>' \
-                 '      <th scope="col">Title</th>' \
-                 '      <th scope="col">Description</th>' \
-                 '    </tr>' \
-                 '  </thead>' \
-                 '  <tbody>'
-
-        for project in projects_pages:
-            projects.append(project)
-            for column in project.get_columns():
-                for card in column.get_cards():
-                    issue = card.get_content()
-                    result += '<tr>' \
-                              '  <td>' + organization.name + '</td>' \
-                                                             '  <td>' + project.name + '</td> ' \
-                                                                                       '  <td>' + column.name + '</td> ' \
-                                                                                                                '  <td>' + str(
-                        issue.number) + '</td> ' \
-                                        '  <td>' + issue.title + '</td> ' \
-                                                                 '  <td>' + issue.body + '</td>' \
-                                                                                         '</td>'
-
-        result += '</tbody>' \
-                  '</table>'
-        return result
+        projects_pages = self.get_projects(organization, repo)
+        organization = self.get_organization(organization)
+
+        rows = ((organization.name, project_name, column_name, issue)
+                for project_name, column_name, repo_name, issue in self.load_project_board(projects_pages))
 
+        return "".join(render.project_table(rows, self.body_limit))
+
+    @metered
     @command(output_type="JSON",
              description="Create JSON dump for all Projects in an organization (or organization/repo)")
     @parameter(
@@ -603,38 +1103,35 @@ class GithubSummary:
         default=''
     )
     def get_project_tickets(self, organization_name, repo: str = None):
-        organization = self.g.get_organization(organization_name)
-        projects = []
-        tickets = dict()
+        """Returns the board tickets keyed by issue number, the shape the plugin has always returned
 
-        if repo != '':
-            repos = organization.get_repo(repo)
-            projects_pages = repos.get_projects()
-        else:
-            projects_pages = organization.get_projects()
-
-        for project in projects_pages:
-            projects.append(project)
-            for column in project.get_columns():
-                for card in column.get_cards():
-                    ticket = dict()
+        Issues with the same number in different repos share an entry, `load_project_tickets` keeps them apart.
+        """
+        tickets = dict()
 
-                    issue = card.get_content()
+        for ticket in self.load_project_tickets(organization_name, repo).values():
+            if ticket["number"] in tickets:
+                tickets[ticket["number"]]["project"].extend(ticket["project"])
+            else:
+                tickets[ticket["number"]] = ticket
 
-                    if str(issue.number) in tickets:
-                        tickets[str(issue.number)]["project"].append(
-                            {"project": str(project.name), "column": str(column.name)})
-                    else:
+        return tickets
 
-                        ticket["project"] = [{"project": str(project.name), "column": str(column.name)}]
-                        ticket["repo"] = str(issue.repository.name)
-                        ticket["organization"] = str(organization_name)
-                        ticket["number"] = str(issue.number)
+    def load_project_tickets(self, organization_name, repo: str = None):
+        """Returns the board tickets keyed by organization/repo/number, like the ticket store"""
+        projects_pages = self.get_projects(organization_name, repo)
+        tickets = dict()
 
-                        tickets[str(issue.number)] = ticket
+        for project_name, column_name, repo_name, issue in self.load_project_board(projects_pages):
+            key = ticket_key({"organization": organization_name, "repo": repo_name, "number": issue.number})
+            if key not in tickets:
+                tickets[key] = {"project": [], "repo": str(repo_name), "organization": str(organization_name),
+                                "number": str(issue.number)}
+            tickets[key]["project"].append({"project": str(project_name), "column": str(column_name)})
 
         return tickets
 
+    @metered
     @command(output_type="JSON",
              description="Create JSON dump for all Tickets associated with Projects in an organization (or "
                          "organization/repo) and updates metadata")
@@ -659,9 +1156,18 @@ class GithubSummary:
         default=''
     )
     def full_directory_sync(self, directory, organization, repo_name):
-        self.sync_project_tickets(directory, organization, repo_name)
+        # A rerun after a failure skips the project sync if it finished, the ticket sync resumes on its own
+        checkpoint = Checkpoint(os.path.join(directory, "sync.checkpoint"),
+                                {"organization": organization, "repo_name": repo_name})
+
+        if "projects" not in checkpoint:
+            self.sync_project_tickets(directory, organization, repo_name)
+            checkpoint.record({"projects": True})
+
         self.sync_tickets_directory(directory)
+        checkpoint.clear()
 
+    @metered
     @command(output_type="JSON",
              description="Create JSON dump for all Tickets associated with Projects in an organization (or "
                          "organization/repo)")
@@ -688,38 +1194,33 @@ class GithubSummary:
     def sync_project_tickets(self, directory, organization, repo_name):
 
         # Sync Project Cards
-        project_tickets = self.get_project_tickets(organization, repo_name)
+        project_tickets = self.load_project_tickets(organization, repo_name)
 
-        # Update the projects for all aligned tickets
-        for ticket_number in project_tickets:
-            file = f"{directory}/{ticket_number}.json"
-            ticket = dict()
-            if os.path.exists(file):
-                with open(file) as json_file:
-                    ticket = json.load(json_file)
-
-            ticket["project"] = project_tickets[ticket_number]["project"]
-            ticket["repo"] = project_tickets[ticket_number]["repo"]
-            ticket["organization"] = project_tickets[ticket_number]["organization"]
-            ticket["number"] = project_tickets[ticket_number]["number"]
-
-            with open(file, 'w') as outfile:
-                json.dump(ticket, outfile)
-
-        # If an issue is no longer aligned to a project, remove it
-        for file in os.listdir(directory):
-            if file.endswith(".json"):
-                ticket_number = file[:-5]
-
-                if ticket_number not in project_tickets:
-                    with open(f"{directory}/{file}") as json_file:
-                        ticket = json.load(json_file)
+        with self.directory_lock(directory), self.open_ticket_store(directory) as store:
+            tickets = store.load()
+
+            # Update the projects for all aligned tickets
+            aligned = set()
+            for key, project_ticket in project_tickets.items():
+                ticket = tickets.setdefault(key, dict())
+
+                ticket["project"] = project_ticket["project"]
+                ticket["repo"] = project_ticket["repo"]
+                ticket["organization"] = project_ticket["organization"]
+                ticket["number"] = project_ticket["number"]
+                aligned.add(key)
+
+            # If an issue is no longer aligned to a project, remove it
+            for key, ticket in tickets.items():
+                if key not in aligned:
                     ticket["project"] = []
-                    with open(f"{directory}/{file}", 'w') as outfile:
-                        json.dump(ticket, outfile)
+
+            # Only the tickets that changed are written
+            store.save(tickets)
 
         return project_tickets
 
+    @metered
     @command(output_type="JSON",
              description="Updates the JSON dump for all Tickets")
     @parameter(
@@ -728,55 +1229,70 @@ class GithubSummary:
         optional=False,
         type="String",
     )
-    def sync_tickets_directory(self, directory):
-        tickets = list()
-        for file in os.listdir(directory):
-            if file.endswith(".json"):
-                with open(f"{directory}/{file}") as json_file:
-                    ticket = json.load(json_file)
+    @parameter(
+        key="workers",
+        description="How many tickets to refresh concurrently",
+        optional=True,
+        type="Integer",
+        default=8,
+    )
+    def sync_tickets_directory(self, directory, workers: int = 8):
 
-                tickets.append(self.sync_ticket(organization=ticket["organization"],
-                                                repo_name=ticket["repo"],
-                                                ticket=ticket,
-                                                issue_number=ticket["number"],
-                                                directory=directory,
-                                                file=file))
+        def sync(ticket):
+            return self.sync_ticket(organization=ticket["organization"],
+                                    repo_name=ticket["repo"],
+                                    ticket=ticket,
+                                    issue_number=ticket["number"])
 
-        return tickets
+        synced = list()
+        with self.directory_lock(directory), self.open_ticket_store(directory) as store:
+            # Tickets synced by a run that failed partway are not synced again by the rerun. Read and cleared
+            # under the lock, so a concurrent sync of the directory never resumes or removes this one's
+            checkpoint = Checkpoint(os.path.join(directory, "tickets.checkpoint"), {"directory": directory})
+
+            tickets = store.load()
+            keys = [key for key in tickets if key not in checkpoint]
+            synced.extend(tickets[key] for key in tickets if key in checkpoint)
+
+            # Write back in batches, so an interrupted sync keeps most of its work
+            for start in range(0, len(keys), self.ticket_batch_size):
+                batch = keys[start:start + self.ticket_batch_size]
+                results = self.pipeline(sync, [tickets[key] for key in batch], workers=workers)
+
+                store.save(dict(zip(batch, results)))
+                checkpoint.record({key: True for key in batch})
+                synced.extend(results)
+
+            checkpoint.clear()
+
+        return synced
 
-    def sync_ticket(self, directory: str,
-                    file: str,
-                    organization: str,
+    def sync_ticket(self, organization: str,
                     repo_name: str,
                     issue=None,
                     ticket=None,
                     issue_number: int = None):
 
         if ticket is None:
-            if os.path.exists(f"{directory}/{file}"):
-                with open(f"{directory}/{file}") as json_file:
-                    ticket = json.load(json_file)
-            else:
-                ticket = dict()
+            ticket = dict()
 
         if "status" in ticket and ticket["status"] == "CLOSED":
             return ticket
 
         if issue_number and not issue:
-            repo = self.g.get_repo(f'{organization}/{repo_name}')
-            issue = repo.get_issue(number=int(issue_number))
+            repo = self.get_repo(organization, repo_name)
+            issue = self.get_issue_if_modified(repo, issue_number, ticket.get("last_modified"))
+
+            # Unchanged since the last sync
+            if issue is None:
+                return ticket
 
         if "last_modified" in ticket and datetime.strptime(ticket["last_modified"],
                                                            "%a, %d %b %Y %H:%M:%S %Z") >= datetime.strptime(
             issue.last_modified, "%a, %d %b %Y %H:%M:%S %Z"):
             return ticket
 
-        ticket = self.get_ticket_details(organization, repo_name, ticket=ticket, issue=issue, issue_number=issue_number)
-
-        with open(f"{directory}/{file}", 'w') as outfile:
-            json.dump(ticket, outfile)
-
-        return ticket
+        return self.get_ticket_details(organization, repo_name, ticket=ticket, issue=issue, issue_number=issue_number)
 
     def get_ticket_details(self,
                            organization: str,
@@ -786,12 +1302,12 @@ class GithubSummary:
                            issue_number: int = None):
 
         if issue is None and issue_number:
-            repo = self.g.get_repo(f'{organization}/{repo_name}')
+            repo = self.get_repo(organization, repo_name)
             issue = repo.get_issue(number=int(issue_number))
 
         ticket["body"] = str(issue.body)
         if issue.user:
-            ticket["assigned"] = str(issue.user.name) if issue.user.name else str(issue.user.login)
+            ticket["assigned"] = str(self.users.display_name(issue.user))
 
         ticket["number"] = str(issue.number)
         ticket["title"] = str(issue.title)
@@ -800,15 +1316,73 @@ class GithubSummary:
         ticket["status"] = str(issue.state)
         ticket["last_modified"] = str(issue.last_modified)
 
-        comments = issue.get_comments()
-        ticket["comments"] = dict()
-        for comment in comments:
-            if comment.id not in ticket['comments']:
-                ticket["comments"][comment.id] = {
-                    "body": str(comment.body),
-                    "created": str(comment.created_at),
-                    "user": str(comment.user.name) if comment.user.name else str(comment.user.login),
-                    "id": str(comment.id),
-                }
+        # Comments are keyed by the string id, which is what they come back as after a JSON round trip
+        ticket["comments"] = {str(key): value for key, value in ticket.get("comments", dict()).items()}
+
+        # Only comments created or edited since the newest one a sync fetched are fetched again. Comments pushed by
+        # webhooks do not move this cursor, so one that a missed delivery left out is still fetched
+        if self.mirror:
+            return self.mirror_comments(organization, repo_name, ticket, issue)
+
+        synced = self.merge_comments(ticket, issue, ticket.get("comments_synced"))
+
+        # Deleted comments never show up in a delta; with more comments stored than GitHub counts, all are fetched
+        if synced and len(ticket["comments"]) > issue.comments:
+            ticket["comments"] = dict()
+            synced = self.merge_comments(ticket, issue, None)
+
+        if synced:
+            ticket["comments_synced"] = synced
+        else:
+            ticket.pop("comments_synced", None)
 
         return ticket
+
+    def mirror_comments(self, organization: str, repo_name: str, ticket: dict, issue):
+        """Rebuilds the ticket comments from the mirror
+
+        The mirror is only trusted while it holds as many comments of the issue as GitHub counts. Otherwise the
+        comments are fetched in full, which also corrects the mirror.
+        """
+        full_name = f"{organization}/{repo_name}"
+        self.mirror.refresh(self.get_repo(organization, repo_name))
+
+        rows = self.mirror.get_comments(full_name, issue.number)
+        if len(rows) != issue.comments:
+            comments = list(issue.get_comments())
+            self.mirror.replace_comments(full_name, issue.number, comments)
+            rows = self.mirror.get_comments(full_name, issue.number)
+
+        ticket["comments"] = {str(comment_id): {
+            "body": str(body),
+            "created": str(created_at),
+            "updated": str(updated_at),
+            "user": str(user),
+            "id": str(comment_id),
+        } for comment_id, body, user, created_at, updated_at in rows}
+
+        # The mirror had them all, so a sync without it can continue from the newest
+        synced = max((comment["updated"] for comment in ticket["comments"].values()), default=None)
+        if synced:
+            ticket["comments_synced"] = synced
+        else:
+            ticket.pop("comments_synced", None)
+
+        return ticket
+
+    def merge_comments(self, ticket: dict, issue, synced: str = None):
+        """Adds the comments updated since `synced` (all of them without it) and returns the newest update seen"""
+        comments = issue.get_comments(since=datetime.fromisoformat(synced)) if synced else issue.get_comments()
+
+        for comment in comments:
+            ticket["comments"][str(comment.id)] = {
+                "body": str(comment.body),
+                "created": str(comment.created_at),
+                "updated": str(comment.updated_at),
+                "user": str(self.users.display_name(comment.user)),
+                "id": str(comment.id),
+            }
+            if synced is None or datetime.fromisoformat(str(comment.updated_at)) > datetime.fromisoformat(synced):
+                synced = str(comment.updated_at)
+
+        return synced
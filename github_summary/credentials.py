@@ -0,0 +1,134 @@
+"""Several GitHub credentials used as one, each request sent with the credential that has the most quota left
+
+Every token, and every GitHub App installation, has a rate limit of its own, so a pool of them scales crawls beyond
+the budget of a single account.
+"""
+from datetime import datetime, timedelta
+from hashlib import sha256
+from threading import Lock
+import logging
+import os
+import time
+
+from github import Auth, GithubIntegration
+
+logger = logging.getLogger(__name__)
+
+# The token the pooled Github client is built with; the transport swaps it for a credential of the pool
+POOL_TOKEN = "credential-pool"
+POOL_AUTHORIZATION = f"token {POOL_TOKEN}"
+
+
+class TokenCredential:
+    """A personal access token"""
+
+    def __init__(self, token: str):
+        self.value = token
+        # A digest of the whole token, tokens that share their last characters still get names of their own
+        self.name = f"token:{sha256(token.encode()).hexdigest()[:12]}"
+
+    def token(self):
+        return self.value
+
+
+class AppInstallationCredential:
+    """An installation access token of a GitHub App, renewed shortly before it expires"""
+
+    # Installation tokens live an hour, they are renewed once less than this is left
+    renew_before = timedelta(minutes=5)
+
+    def __init__(self, integration: GithubIntegration, app_id, installation_id):
+        self.integration = integration
+        self.installation_id = int(installation_id)
+        self.name = f"app:{app_id}/{installation_id}"
+        self.value = None
+        self.expires_at = None
+        self.lock = Lock()
+
+    def token(self):
+        with self.lock:
+            if self.value is None or self.expires_at - datetime.utcnow() < self.renew_before:
+                authorization = self.integration.get_access_token(self.installation_id)
+                self.value = authorization.token
+                self.expires_at = authorization.expires_at.replace(tzinfo=None)
+                logger.info(f"Renewed the installation token of {self.name}, valid until {self.expires_at}")
+
+            return self.value
+
+
+def read_private_key(private_key: str):
+    """Accepts the PEM text itself or the path of a PEM file"""
+    if os.path.exists(private_key):
+        with open(private_key) as key_file:
+            return key_file.read()
+    return private_key
+
+
+class CredentialPool:
+    """Picks the credential with the most remaining budget for each request
+
+    Budgets are read from the rate limit headers of the responses each credential received; a credential not yet
+    used counts as having a full budget.
+    """
+
+    def __init__(self, credentials, limit: int = 5000):
+        self.credentials = list(credentials)
+        self.limit = limit
+        self.lock = Lock()
+        self.budgets = dict()
+        self.uses = {credential.name: 0 for credential in self.credentials}
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def remaining(self, credential, resource: str):
+        budget = self.budgets.get((credential.name, resource))
+        if budget is None:
+            return self.limit
+
+        remaining, reset = budget
+        return self.limit if reset <= time.time() else remaining
+
+    def choose(self, resource: str):
+        with self.lock:
+            # The least used credential wins a tie, so fresh credentials are spread evenly
+            credential = max(self.credentials,
+                             key=lambda credential: (self.remaining(credential, resource), -self.uses[credential.name]))
+            self.uses[credential.name] += 1
+            return credential
+
+    def record(self, credential, resource: str, headers: dict):
+        headers = {key.lower(): value for key, value in headers.items()}
+        if "x-ratelimit-remaining" not in headers:
+            return
+
+        with self.lock:
+            resource = headers.get("x-ratelimit-resource", resource)
+            self.budgets[(credential.name, resource)] = (int(headers["x-ratelimit-remaining"]),
+                                                         int(headers.get("x-ratelimit-reset", 0)))
+
+    def available(self, resource: str):
+        """Whether any credential still has budget for the resource"""
+        with self.lock:
+            return any(self.remaining(credential, resource) > 0 for credential in self.credentials)
+
+    def report(self):
+        with self.lock:
+            return {credential.name: {"requests": self.uses[credential.name],
+                                      "budgets": {resource: {"remaining": remaining, "reset": reset}
+                                                  for (name, resource), (remaining, reset) in self.budgets.items()
+                                                  if name == credential.name}}
+                    for credential in self.credentials}
+
+
+def build_pool(tokens=(), app_id=None, private_key: str = None, installation_ids=(), base_url: str = None):
+    """Returns a pool of the given tokens and GitHub App installations"""
+    credentials = [TokenCredential(token) for token in tokens if token]
+
+    if app_id and private_key:
+        integration = GithubIntegration(auth=Auth.AppAuth(int(app_id), read_private_key(private_key)),
+                                        base_url=base_url)
+        credentials.extend(AppInstallationCredential(integration, app_id, installation_id)
+                           for installation_id in installation_ids if installation_id)
+
+    return CredentialPool(credentials)
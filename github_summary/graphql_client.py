@@ -0,0 +1,222 @@
+from datetime import datetime
+from threading import Lock
+import requests
+
+try:
+    from .records import IssueRecord, Label, PullRecord, User, parse_timestamp
+except:
+    from records import IssueRecord, Label, PullRecord, User, parse_timestamp
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+PAGE_SIZE = 100
+
+AUTHOR_FIELDS = "login ... on User { name }"
+
+PULLS_QUERY = """
+query($owner: String!, $name: String!, $states: [PullRequestState!], $base: String, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: %d, after: $cursor, states: $states, baseRefName: $base,
+                 orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number title body state createdAt updatedAt closedAt mergedAt baseRefName
+        author { %s }
+        labels(first: 20) { nodes { name } }
+      }
+    }
+  }
+}
+""" % (PAGE_SIZE, AUTHOR_FIELDS)
+
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $states: [IssueState!], $since: DateTime, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: %d, after: $cursor, states: $states, filterBy: {since: $since},
+           orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number title body state createdAt updatedAt closedAt
+        author { %s }
+        assignees(first: 1) { nodes { login name } }
+        labels(first: 20) { nodes { name } }
+      }
+    }
+  }
+}
+""" % (PAGE_SIZE, AUTHOR_FIELDS)
+
+CLOSED_ISSUE_LINKS_QUERY = """
+query($owner: String!, $name: String!, $since: DateTime, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: %d, after: $cursor, states: [CLOSED], filterBy: {since: $since},
+           orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number title body state createdAt updatedAt closedAt
+        author { %s }
+        assignees(first: 1) { nodes { login name } }
+        labels(first: 20) { nodes { name } }
+        closedByPullRequestsReferences(first: 10, includeClosedPrs: true) { nodes { number } }
+      }
+    }
+  }
+}
+""" % (PAGE_SIZE, AUTHOR_FIELDS)
+
+PULL_STATES = {"open": ["OPEN"], "closed": ["CLOSED", "MERGED"], "all": None}
+
+ISSUE_STATES = {"open": ["OPEN"], "closed": ["CLOSED"], "all": None}
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def to_user(node):
+    # Deleted accounts come back as a null author
+    if not node:
+        return User("ghost")
+    return User(node.get("login"), node.get("name"))
+
+
+def to_labels(node):
+    return [Label(label["name"]) for label in node["labels"]["nodes"]]
+
+
+def to_pull(node):
+    return PullRecord(number=node["number"],
+                      title=node["title"],
+                      body=node["body"],
+                      state="open" if node["state"] == "OPEN" else "closed",
+                      user=to_user(node["author"]),
+                      labels=to_labels(node),
+                      created_at=parse_timestamp(node["createdAt"]),
+                      updated_at=parse_timestamp(node["updatedAt"]),
+                      closed_at=parse_timestamp(node["closedAt"]),
+                      merged_at=parse_timestamp(node["mergedAt"]),
+                      base=node["baseRefName"])
+
+
+def to_issue(node):
+    assignees = node["assignees"]["nodes"]
+    return IssueRecord(number=node["number"],
+                       title=node["title"],
+                       body=node["body"],
+                       state=node["state"].lower(),
+                       user=to_user(node["author"]),
+                       assignee=to_user(assignees[0]) if assignees else None,
+                       labels=to_labels(node),
+                       created_at=parse_timestamp(node["createdAt"]),
+                       updated_at=parse_timestamp(node["updatedAt"]),
+                       closed_at=parse_timestamp(node["closedAt"]))
+
+
+class GraphQLClient:
+    """Lists PRs and issues through the GitHub GraphQL API, 100 fully populated nodes per request
+
+    `post` can be swapped for a recorded-response stand-in; it receives the request payload and returns the
+    decoded JSON response. With a `credentials` pool each request is sent with the credential that has the most
+    GraphQL budget left, over a session of its own.
+    """
+
+    def __init__(self, token: str, url: str = GRAPHQL_URL, post=None, scheduler=None, credentials=None):
+        self.url = url
+        self.scheduler = scheduler
+        self.credentials = credentials
+        self.sessions = dict()
+        self.sessions_lock = Lock()
+        self.session = self.new_session(token)
+        self.post = post if post else self.post_json
+
+    def new_session(self, token: str):
+        session = requests.Session()
+        session.headers["Authorization"] = f"bearer {token}"
+        if self.scheduler is not None:
+            # Keep a connection alive for every request the scheduler lets through at once
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.scheduler.max_concurrent)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
+
+    def session_for(self, credential):
+        """Returns the session of a pooled credential, with its current token"""
+        token = credential.token()
+        with self.sessions_lock:
+            if credential.name not in self.sessions:
+                self.sessions[credential.name] = self.new_session(token)
+            session = self.sessions[credential.name]
+            session.headers["Authorization"] = f"bearer {token}"
+            return session
+
+    def post_json(self, payload: dict):
+        if self.scheduler is None:
+            response = self.session.post(self.url, json=payload)
+        else:
+            def send(credential):
+                session = self.session_for(credential) if credential is not None else self.session
+                response = session.post(self.url, json=payload)
+                return response, response.status_code, response.headers, response.text
+
+            response = self.scheduler.send("graphql", send, self.credentials, page=lambda response: True)
+
+        response.raise_for_status()
+        return response.json()
+
+    def query(self, query: str, variables: dict):
+        result = self.post({"query": query, "variables": variables})
+
+        if result.get("errors"):
+            raise GraphQLError("; ".join(error.get("message", str(error)) for error in result["errors"]))
+
+        return result["data"]
+
+    def paginate(self, query: str, variables: dict, connection: str):
+        cursor = None
+        while True:
+            data = self.query(query, dict(variables, cursor=cursor))
+            page = data["repository"][connection]
+
+            for node in page["nodes"]:
+                yield node
+
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            cursor = page["pageInfo"]["endCursor"]
+
+    def get_pulls(self, full_name: str, state: str, since: datetime, base: str = None):
+        """Yields the PRs updated since the given date, newest first"""
+        owner, name = full_name.split("/", 1)
+        variables = {"owner": owner, "name": name, "states": PULL_STATES[state], "base": base}
+
+        for node in self.paginate(PULLS_QUERY, variables, "pullRequests"):
+            pr = to_pull(node)
+            if pr.updated_at < since:
+                break
+            yield pr
+
+    def get_issues(self, full_name: str, state: str, since: datetime):
+        """Yields the issues updated since the given date, newest first"""
+        owner, name = full_name.split("/", 1)
+        variables = {"owner": owner, "name": name, "states": ISSUE_STATES[state],
+                     "since": since.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+        for node in self.paginate(ISSUES_QUERY, variables, "issues"):
+            issue = to_issue(node)
+            if issue.updated_at < since:
+                break
+            yield issue
+
+    def get_closed_issue_links(self, full_name: str, since: datetime):
+        """Yields each issue closed since the given date with the numbers of the PRs that closed it"""
+        owner, name = full_name.split("/", 1)
+        variables = {"owner": owner, "name": name, "since": since.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+        for node in self.paginate(CLOSED_ISSUE_LINKS_QUERY, variables, "issues"):
+            issue = to_issue(node)
+            if issue.updated_at < since:
+                break
+            if issue.closed_at < since:
+                continue
+
+            yield issue, [pr["number"] for pr in node["closedByPullRequestsReferences"]["nodes"]]
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from threading import RLock
+import atexit
+import json
+import sqlite3
+import time
+
+
+class MemoryResponseStore:
+    """Keeps validated GET responses in memory, evicting the least recently used once `max_bytes` is exceeded"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = RLock()
+
+    def get(self, url: str):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def set(self, url: str, status: int, headers: dict, body: str):
+        with self.lock:
+            self.pop(url)
+
+            self.entries[url] = (status, headers, body)
+            self.size += len(body)
+
+            while self.size > self.max_bytes and self.entries:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def pop(self, url: str):
+        with self.lock:
+            entry = self.entries.pop(url, None)
+            if entry is not None:
+                self.size -= len(entry[2])
+            return entry
+
+
+class SqliteResponseStore:
+    """Keeps validated GET responses in a SQLite file so they survive restarts, evicting the least recently used
+    once `max_bytes` is exceeded
+
+    The total size is kept in memory, and access times are buffered and written with the next insert, once
+    `flush_every` hits piled up or at exit, so a cache hit costs a single SELECT.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, flush_every: int = 256):
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.lock = RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                        "url TEXT PRIMARY KEY, status INTEGER, headers TEXT, body TEXT, size INTEGER, accessed REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # url -> access time not yet written
+        self.accessed = dict()
+        atexit.register(self.flush)
+
+    def get(self, url: str):
+        with self.lock:
+            row = self.db.execute("SELECT status, headers, body FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+
+            self.accessed[url] = time.time()
+            if len(self.accessed) >= self.flush_every:
+                self.flush()
+            return row[0], json.loads(row[1]), row[2]
+
+    def write_accessed(self):
+        """Writes the buffered access times, the caller commits"""
+        self.db.executemany("UPDATE responses SET accessed = ? WHERE url = ?",
+                            [(accessed, url) for url, accessed in self.accessed.items()])
+        self.accessed.clear()
+
+    def set(self, url: str, status: int, headers: dict, body: str):
+        with self.lock:
+            # Eviction goes by access time, so the buffered ones are written first
+            self.write_accessed()
+
+            row = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                self.size -= row[0]
+
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                            (url, status, json.dumps(headers), body, len(body), time.time()))
+            self.size += len(body)
+
+            while self.size > self.max_bytes:
+                row = self.db.execute("SELECT url, size FROM responses ORDER BY accessed LIMIT 1").fetchone()
+                if row is None:
+                    break
+                self.db.execute("DELETE FROM responses WHERE url = ?", (row[0],))
+                self.size -= row[1]
+
+            self.db.commit()
+
+    def pop(self, url: str):
+        with self.lock:
+            row = self.db.execute("SELECT status, headers, body, size FROM responses WHERE url = ?",
+                                  (url,)).fetchone()
+            if row is None:
+                return None
+
+            self.accessed.pop(url, None)
+            self.db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.db.commit()
+            self.size -= row[3]
+            return row[0], json.loads(row[1]), row[2]
+
+    def flush(self):
+        with self.lock:
+            if self.accessed:
+                self.write_accessed()
+                self.db.commit()
@@ -0,0 +1,113 @@
+from threading import Lock
+import bisect
+
+# Upper bounds in seconds of the request latency histogram, the last bucket holds everything slower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def latency_labels():
+    return [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+
+
+class RequestCounter:
+    """GitHub traffic of one command call, shared with the worker threads it starts"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = 0
+        self.pages = 0
+        self.bytes = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.spent = dict()
+
+    def add(self, resource: str, status: int, size: int, latency: float, page: bool):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            self.latency += latency
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+            if page:
+                self.pages += 1
+            if status >= 400:
+                self.errors += 1
+
+            # 304 answers are free, everything else is charged against the resource's rate limit
+            if status == 304:
+                self.not_modified += 1
+            else:
+                self.spent[resource] = self.spent.get(resource, 0) + 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "pages": self.pages,
+                "bytes": self.bytes,
+                "not_modified": self.not_modified,
+                "errors": self.errors,
+                "latency": round(self.latency, 3),
+                "latency_histogram": dict(zip(latency_labels(), self.histogram)),
+                "rate_limit_spent": dict(self.spent),
+            }
+
+
+class PerformanceStats:
+    """Totals per command since the plugin started (or was last reset)"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.commands = dict()
+
+    def add(self, command: str, counter: RequestCounter, wall_time: float):
+        report = counter.to_dict()
+
+        with self.lock:
+            stats = self.commands.setdefault(command, {
+                "calls": 0,
+                "wall_time": 0.0,
+                "requests": 0,
+                "pages": 0,
+                "bytes": 0,
+                "not_modified": 0,
+                "errors": 0,
+                "latency": 0.0,
+                "latency_histogram": dict.fromkeys(latency_labels(), 0),
+                "rate_limit_spent": dict(),
+            })
+
+            stats["calls"] += 1
+            stats["wall_time"] = round(stats["wall_time"] + wall_time, 3)
+            for key in ("requests", "pages", "bytes", "not_modified", "errors"):
+                stats[key] += report[key]
+            stats["latency"] = round(stats["latency"] + report["latency"], 3)
+            for label, count in report["latency_histogram"].items():
+                stats["latency_histogram"][label] += count
+            for resource, spent in report["rate_limit_spent"].items():
+                stats["rate_limit_spent"][resource] = stats["rate_limit_spent"].get(resource, 0) + spent
+
+        return report
+
+    def to_dict(self):
+        with self.lock:
+            commands = dict()
+            for command, stats in self.commands.items():
+                commands[command] = dict(stats, latency_histogram=dict(stats["latency_histogram"]),
+                                         rate_limit_spent=dict(stats["rate_limit_spent"]))
+                revalidated = stats["requests"]
+                commands[command]["http_cache_hit_rate"] = \
+                    round(stats["not_modified"] / revalidated, 3) if revalidated else None
+            return commands
+
+    def reset(self):
+        with self.lock:
+            self.commands.clear()
+
+
+def cache_stats(cache):
+    lookups = cache.hits + cache.misses
+    return {"entries": len(cache), "hits": cache.hits, "misses": cache.misses,
+            "hit_rate": round(cache.hits / lookups, 3) if lookups else None}
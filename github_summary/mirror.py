@@ -0,0 +1,302 @@
+from datetime import datetime, timezone
+from threading import Lock, RLock
+import os
+import sqlite3
+import time
+
+try:
+    from .records import IssueRecord, Label, PullRecord, User, split_url
+except:
+    from records import IssueRecord, Label, PullRecord, User, split_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (login TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS pulls (
+    repo TEXT, number INTEGER, title TEXT, body TEXT, state TEXT, user TEXT, base TEXT,
+    created_at TEXT, updated_at TEXT, closed_at TEXT, merged_at TEXT,
+    PRIMARY KEY (repo, number));
+CREATE INDEX IF NOT EXISTS pulls_updated ON pulls (repo, updated_at);
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT, number INTEGER, title TEXT, body TEXT, state TEXT, user TEXT, assignee TEXT,
+    created_at TEXT, updated_at TEXT, closed_at TEXT,
+    PRIMARY KEY (repo, number));
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (repo, updated_at);
+CREATE TABLE IF NOT EXISTS labels (repo TEXT, number INTEGER, name TEXT, PRIMARY KEY (repo, number, name));
+CREATE TABLE IF NOT EXISTS comments (
+    repo TEXT, id INTEGER, number INTEGER, body TEXT, user TEXT, created_at TEXT, updated_at TEXT,
+    PRIMARY KEY (repo, id));
+CREATE INDEX IF NOT EXISTS comments_number ON comments (repo, number);
+CREATE TABLE IF NOT EXISTS links (repo TEXT, number INTEGER, updated_at TEXT, pulls TEXT, PRIMARY KEY (repo, number));
+CREATE TABLE IF NOT EXISTS cursors (repo TEXT, resource TEXT, since TEXT, PRIMARY KEY (repo, resource));
+"""
+
+PULLS_INSERT = "INSERT OR REPLACE INTO pulls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+ISSUES_INSERT = "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+COMMENTS_INSERT = "INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def to_text(value: datetime):
+    """Stores timestamps as sortable naive UTC text"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=" ")
+
+
+def to_datetime(value: str):
+    return datetime.fromisoformat(value) if value else None
+
+
+class ActivityMirror:
+    """Local SQLite copy of the PRs, issues, labels, comments and users of the repos the commands read
+
+    Each refresh only asks GitHub for what changed since the newest `updated_at` seen per repo and resource, so
+    reports over long windows are answered locally.
+    """
+
+    def __init__(self, directory: str, display_name=None, refresh_interval: float = 60):
+        os.makedirs(directory, exist_ok=True)
+
+        self.display_name = display_name if display_name else lambda user: user.name if user.name else user.login
+        self.refresh_interval = refresh_interval
+        self.refreshed = dict()
+        self.lock = RLock()
+        self.refresh_locks = dict()
+
+        self.db = sqlite3.connect(os.path.join(directory, "mirror.sqlite"), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def execute(self, sql: str, args=()):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def get_cursor(self, full_name: str, resource: str):
+        rows = self.execute("SELECT since FROM cursors WHERE repo = ? AND resource = ?", (full_name, resource))
+        return to_datetime(rows[0][0]) if rows else None
+
+    def refresh(self, repo):
+        """Pulls everything updated since the last refresh of the repo, at most once per `refresh_interval`"""
+        full_name = repo.full_name
+
+        with self.lock:
+            refresh_lock = self.refresh_locks.setdefault(full_name, Lock())
+
+        with refresh_lock:
+            if time.time() - self.refreshed.get(full_name, 0) < self.refresh_interval:
+                return
+
+            self.refresh_pulls(repo)
+            self.refresh_issues(repo)
+            self.refresh_comments(repo)
+
+            self.refreshed[full_name] = time.time()
+
+    def write(self, full_name: str, resource: str, newest: datetime, sql: str, rows, users, labels):
+        """Stores one refresh of a resource in a single transaction"""
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", users.items())
+            self.db.executemany(sql, rows)
+
+            for number, names in labels.items():
+                self.db.execute("DELETE FROM labels WHERE repo = ? AND number = ?", (full_name, number))
+                self.db.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?)",
+                                    [(full_name, number, name) for name in names])
+
+            if newest is not None:
+                self.db.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)",
+                                (full_name, resource, to_text(newest)))
+            self.db.commit()
+
+    def user_login(self, user, users: dict):
+        if user is None:
+            return None
+        if user.login not in users:
+            users[user.login] = self.display_name(user)
+        return user.login
+
+    def refresh_pulls(self, repo):
+        full_name = repo.full_name
+        cursor = self.get_cursor(full_name, "pulls")
+
+        newest = None
+        rows, users, labels = [], {}, {}
+        for pr in repo.get_pulls(state='all', sort='updated', direction='desc'):
+            updated_at = to_datetime(to_text(pr.updated_at))
+            if cursor and updated_at < cursor:
+                break
+            newest = max(newest, updated_at) if newest else updated_at
+
+            rows.append(self.pull_row(full_name, pr, users))
+            labels[pr.number] = [label.name for label in pr.labels]
+
+        self.write(full_name, "pulls", newest, PULLS_INSERT, rows, users, labels)
+
+    def pull_row(self, full_name: str, pr, users: dict):
+        return (full_name, pr.number, pr.title, pr.body, pr.state, self.user_login(pr.user, users), pr.base.ref,
+                to_text(pr.created_at), to_text(pr.updated_at), to_text(pr.closed_at), to_text(pr.merged_at))
+
+    def refresh_issues(self, repo):
+        full_name = repo.full_name
+        cursor = self.get_cursor(full_name, "issues")
+
+        if cursor:
+            issues = repo.get_issues(state='all', since=cursor, sort='updated', direction='desc')
+        else:
+            issues = repo.get_issues(state='all', sort='updated', direction='desc')
+
+        newest = None
+        rows, users, labels = [], {}, {}
+        for issue in issues:
+            updated_at = to_datetime(to_text(issue.updated_at))
+            newest = max(newest, updated_at) if newest else updated_at
+
+            # The issues endpoint also returns pull requests, those are mirrored from the pulls endpoint
+            if issue.pull_request:
+                continue
+
+            rows.append(self.issue_row(full_name, issue, users))
+            labels[issue.number] = [label.name for label in issue.labels]
+
+        self.write(full_name, "issues", newest, ISSUES_INSERT, rows, users, labels)
+
+    def issue_row(self, full_name: str, issue, users: dict):
+        return (full_name, issue.number, issue.title, issue.body, issue.state, self.user_login(issue.user, users),
+                self.user_login(issue.assignee, users), to_text(issue.created_at), to_text(issue.updated_at),
+                to_text(issue.closed_at))
+
+    def refresh_comments(self, repo):
+        full_name = repo.full_name
+        cursor = self.get_cursor(full_name, "comments")
+
+        if cursor:
+            comments = repo.get_issues_comments(sort='updated', direction='asc', since=cursor)
+        else:
+            comments = repo.get_issues_comments(sort='updated', direction='asc')
+
+        newest = None
+        rows, users = [], {}
+        for comment in comments:
+            updated_at = to_datetime(to_text(comment.updated_at))
+            newest = max(newest, updated_at) if newest else updated_at
+
+            _, _, number = split_url(comment.issue_url)
+            rows.append(self.comment_row(full_name, number, comment, users))
+
+        self.write(full_name, "comments", newest, COMMENTS_INSERT, rows, users, {})
+
+    def comment_row(self, full_name: str, number: int, comment, users: dict):
+        return (full_name, comment.id, number, comment.body, self.user_login(comment.user, users),
+                to_text(comment.created_at), to_text(comment.updated_at))
+
+    # Single changes pushed by webhooks. They leave the refresh cursors alone, so the next refresh still
+    # reconciles anything a missed delivery left out
+
+    def store_pull(self, full_name: str, pr):
+        users = dict()
+        self.write(full_name, "pulls", None, PULLS_INSERT, [self.pull_row(full_name, pr, users)], users,
+                   {pr.number: [label.name for label in pr.labels]})
+
+    def store_issue(self, full_name: str, issue):
+        users = dict()
+        self.write(full_name, "issues", None, ISSUES_INSERT, [self.issue_row(full_name, issue, users)], users,
+                   {issue.number: [label.name for label in issue.labels]})
+
+    def store_comment(self, full_name: str, number: int, comment):
+        users = dict()
+        self.write(full_name, "comments", None, COMMENTS_INSERT, [self.comment_row(full_name, number, comment, users)],
+                   users, {})
+
+    def delete_issue(self, full_name: str, number: int):
+        with self.lock:
+            for table in ("issues", "labels", "comments", "links"):
+                self.db.execute(f"DELETE FROM {table} WHERE repo = ? AND number = ?", (full_name, number))
+            self.db.commit()
+
+    def delete_comment(self, full_name: str, comment_id: int):
+        with self.lock:
+            self.db.execute("DELETE FROM comments WHERE repo = ? AND id = ?", (full_name, comment_id))
+            self.db.commit()
+
+    def get_user(self, login: str):
+        if login is None:
+            return None
+        rows = self.execute("SELECT name FROM users WHERE login = ?", (login,))
+        return User(login, rows[0][0] if rows else None)
+
+    def get_labels(self, full_name: str, number: int):
+        return [Label(row[0]) for row in
+                self.execute("SELECT name FROM labels WHERE repo = ? AND number = ?", (full_name, number))]
+
+    def to_pull(self, row):
+        full_name, number, title, body, state, user, base, created_at, updated_at, closed_at, merged_at = row
+        return PullRecord(number=number, title=title, body=body, state=state, user=self.get_user(user),
+                          labels=self.get_labels(full_name, number), created_at=to_datetime(created_at),
+                          updated_at=to_datetime(updated_at), closed_at=to_datetime(closed_at),
+                          merged_at=to_datetime(merged_at), base=base)
+
+    def to_issue(self, row):
+        full_name, number, title, body, state, user, assignee, created_at, updated_at, closed_at = row
+        return IssueRecord(number=number, title=title, body=body, state=state, user=self.get_user(user),
+                           assignee=self.get_user(assignee), labels=self.get_labels(full_name, number),
+                           created_at=to_datetime(created_at), updated_at=to_datetime(updated_at),
+                           closed_at=to_datetime(closed_at))
+
+    def get_pulls(self, full_name: str, state: str, since: datetime, base: str = None):
+        """Returns the mirrored PRs updated since the given date, newest first"""
+        sql = "SELECT * FROM pulls WHERE repo = ? AND updated_at >= ?"
+        args = [full_name, to_text(since)]
+        if state != 'all':
+            sql += " AND state = ?"
+            args.append(state)
+        if base:
+            sql += " AND base = ?"
+            args.append(base)
+
+        return [self.to_pull(row) for row in self.execute(sql + " ORDER BY updated_at DESC", args)]
+
+    def get_issues(self, full_name: str, state: str, since: datetime):
+        """Returns the mirrored issues updated since the given date, newest first"""
+        sql = "SELECT * FROM issues WHERE repo = ? AND updated_at >= ?"
+        args = [full_name, to_text(since)]
+        if state != 'all':
+            sql += " AND state = ?"
+            args.append(state)
+
+        return [self.to_issue(row) for row in self.execute(sql + " ORDER BY updated_at DESC", args)]
+
+    def get_issue(self, full_name: str, number: int):
+        rows = self.execute("SELECT * FROM issues WHERE repo = ? AND number = ?", (full_name, number))
+        return self.to_issue(rows[0]) if rows else None
+
+    def get_comments(self, full_name: str, number: int):
+        """Returns the mirrored comments of an issue as (id, body, user name, created_at, updated_at) rows, oldest
+        first"""
+        return self.execute("SELECT comments.id, comments.body, COALESCE(users.name, comments.user), "
+                            "comments.created_at, comments.updated_at FROM comments "
+                            "LEFT JOIN users ON users.login = comments.user "
+                            "WHERE comments.repo = ? AND comments.number = ? ORDER BY comments.created_at",
+                            (full_name, number))
+
+    def replace_comments(self, full_name: str, number: int, comments):
+        """Replaces the mirrored comments of an issue with the complete list fetched from GitHub"""
+        users = dict()
+        rows = [self.comment_row(full_name, number, comment, users) for comment in comments]
+        with self.lock:
+            self.db.execute("DELETE FROM comments WHERE repo = ? AND number = ?", (full_name, number))
+            self.write(full_name, "comments", None, COMMENTS_INSERT, rows, users, {})
+
+    def get_links(self, full_name: str, number: int, updated_at: datetime):
+        """Returns the PRs linked to an issue if they were stored for this version of the issue"""
+        rows = self.execute("SELECT pulls FROM links WHERE repo = ? AND number = ? AND updated_at = ?",
+                            (full_name, number, to_text(updated_at)))
+        if not rows:
+            return None
+        return [int(number) for number in rows[0][0].split(",") if number]
+
+    def save_links(self, full_name: str, number: int, updated_at: datetime, pulls):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?)",
+                            (full_name, number, to_text(updated_at), ",".join(str(pr) for pr in pulls)))
+            self.db.commit()
@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock, local
+import logging
+import time
+
+try:
+    from .metrics import RequestCounter
+except:
+    from metrics import RequestCounter
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("core", "search", "graphql")
+
+
+def resource_for(url: str):
+    """Returns the rate limit bucket a request to `url` is charged against"""
+    if "/graphql" in url:
+        return "graphql"
+    if "/search/" in url:
+        return "search"
+    return "core"
+
+
+class RateLimitScheduler:
+    """Paces GitHub requests against the remaining core, search and GraphQL budgets
+
+    At most `max_concurrent` requests are in flight. When a budget drops to `reserve` the scheduler sleeps until
+    it resets, as long as that is no longer than `max_wait` seconds; otherwise the request is sent and allowed
+    to fail.
+    """
+
+    def __init__(self, max_concurrent: int = 10, reserve: int = None, max_wait: float = 900, max_retries: int = 3):
+        self.max_concurrent = max_concurrent
+        self.semaphore = BoundedSemaphore(max_concurrent)
+        self.reserve = reserve if reserve is not None else max_concurrent
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.lock = Lock()
+        self.budgets = dict()
+        self.spent = 0
+        self.local = local()
+
+    @contextmanager
+    def track(self):
+        """Counts the requests made by the current thread (and any worker bound to it) while the block runs
+
+        Yields the counter and whether this call started it, so nested commands share their caller's count.
+        """
+        counter = getattr(self.local, "counter", None)
+        if counter is not None:
+            yield counter, False
+            return
+
+        self.local.counter = RequestCounter()
+        try:
+            yield self.local.counter, True
+        finally:
+            self.local.counter = None
+
+    def current(self):
+        return getattr(self.local, "counter", None)
+
+    def bind(self, counter, fn):
+        """Wraps `fn` so its requests are charged to `counter` when it runs on a worker thread"""
+
+        def bound(*args, **kwargs):
+            self.local.counter = counter
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.local.counter = None
+
+        return bound
+
+    def wait_time(self, resource: str):
+        with self.lock:
+            budget = self.budgets.get(resource)
+
+        if budget is None:
+            return 0
+
+        remaining, limit, reset = budget
+        wait = reset - time.time()
+        if remaining > self.reserve or wait <= 0:
+            return 0
+        return wait + 1
+
+    @contextmanager
+    def request(self, resource: str):
+        """Holds a request slot, first sleeping until the budget resets if it is (nearly) spent"""
+        wait = self.wait_time(resource)
+        if 0 < wait <= self.max_wait:
+            logger.info(f"GitHub {resource} rate limit nearly spent, sleeping {int(wait)}s until it resets")
+            time.sleep(wait)
+
+        with self.semaphore:
+            yield
+
+    def record(self, resource: str, status: int, headers: dict, size: int = 0, latency: float = 0.0,
+               page: bool = False):
+        """Updates the budget from the rate limit headers of a response and charges the request to the current
+        command"""
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        with self.lock:
+            if "x-ratelimit-remaining" in headers:
+                resource = headers.get("x-ratelimit-resource", resource)
+                self.budgets[resource] = (int(headers["x-ratelimit-remaining"]),
+                                          int(headers.get("x-ratelimit-limit", 0)),
+                                          int(headers.get("x-ratelimit-reset", 0)))
+            self.spent += 1
+
+        counter = self.current()
+        if counter is not None:
+            counter.add(resource, status, size, latency, page)
+
+    def retry_delay(self, attempt: int, status: int, headers: dict, body: str):
+        """Returns how long to wait before retrying a rate limited response, or None if it should not be retried"""
+        if status not in (403, 429) or attempt >= self.max_retries:
+            return None
+
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        if "retry-after" in headers:
+            delay = int(headers["retry-after"])
+        elif headers.get("x-ratelimit-remaining") == "0":
+            delay = int(headers.get("x-ratelimit-reset", 0)) - time.time() + 1
+        elif "secondary rate limit" in (body or "").lower():
+            # GitHub asks for at least a minute between retries, back off exponentially from there
+            delay = 60 * 2 ** attempt
+        else:
+            return None
+
+        return max(delay, 1) if delay <= self.max_wait else None
+
+    def send(self, resource: str, send, credentials=None, page=None, description: str = None):
+        """Sends a request until it is not rate limited (or out of retries) and returns the last response
+
+        `send(credential)` makes one attempt, with the credential of the `credentials` pool it is given (None
+        without a pool), and returns `(response, status, headers, body)`. `page(response)` tells whether the
+        response was a page of a list.
+        """
+        attempt = 0
+        while True:
+            credential = credentials.choose(resource) if credentials is not None else None
+
+            with self.request(resource):
+                started = time.perf_counter()
+                response, status, headers, body = send(credential)
+                latency = time.perf_counter() - started
+
+            self.record(resource, status, headers, size=len(body), latency=latency,
+                        page=bool(page(response)) if page else False)
+
+            if credential is not None:
+                credentials.record(credential, resource, headers)
+
+                # A spent credential is retried right away with one that still has budget
+                if status in (403, 429) and credentials.remaining(credential, resource) == 0 and \
+                        credentials.available(resource) and attempt < self.max_retries:
+                    attempt += 1
+                    continue
+
+            delay = self.retry_delay(attempt, status, headers, body)
+            if delay is None:
+                return response
+
+            logger.warning(f"GitHub rate limited {description or resource}, retrying in {int(delay)}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def report(self):
+        with self.lock:
+            budgets = {resource: {"remaining": remaining, "limit": limit, "reset": reset}
+                       for resource, (remaining, limit, reset) in self.budgets.items()}
+            return {"spent": self.spent, "budgets": budgets}
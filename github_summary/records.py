@@ -0,0 +1,84 @@
+from datetime import datetime
+
+
+def parse_timestamp(value: str):
+    """Parses a GitHub ISO-8601 timestamp into a naive UTC datetime (matching PyGithub)"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+def split_url(url: str):
+    """Returns (organization, repo, number) of an issue or PR API url"""
+    # https://api.github.com/repos/<organization>/<repo>/issues/<number>
+    organization, repo_name, _, number = url.split("/")[-4:]
+    return organization, repo_name, int(number)
+
+
+class User:
+    """A fully populated user, so reading `name` never triggers a lazy completion request"""
+
+    def __init__(self, login: str, name: str = None):
+        self.login = login
+        self.name = name
+
+
+class Label:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Ref:
+    def __init__(self, ref: str):
+        self.ref = ref
+
+
+class PullRecord:
+    """Stand-in for a PyGithub PullRequest carrying only the fields the commands read"""
+
+    def __init__(self, number: int, title: str, body: str, state: str, user: User, labels=None,
+                 created_at: datetime = None, updated_at: datetime = None, closed_at: datetime = None,
+                 merged_at: datetime = None, base: str = None):
+        self.number = number
+        self.title = title
+        self.body = body
+        self.state = state
+        self.user = user
+        self.labels = labels if labels else []
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.closed_at = closed_at
+        self.merged_at = merged_at
+        self.base = Ref(base)
+
+
+class IssueRecord:
+    """Stand-in for a PyGithub Issue carrying only the fields the commands read"""
+
+    # Records are only ever built for issues, never for PRs returned by the issues endpoint
+    pull_request = None
+
+    def __init__(self, number: int, title: str, body: str, state: str, user: User, assignee: User = None,
+                 labels=None, created_at: datetime = None, updated_at: datetime = None,
+                 closed_at: datetime = None):
+        self.number = number
+        self.title = title
+        self.body = body
+        self.state = state
+        self.user = user
+        self.assignee = assignee
+        self.labels = labels if labels else []
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.closed_at = closed_at
+
+
+class CommentRecord:
+    """Stand-in for a PyGithub IssueComment"""
+
+    def __init__(self, id: int, body: str, user: User, created_at: datetime = None, updated_at: datetime = None):
+        self.id = id
+        self.body = body
+        self.user = user
+        self.created_at = created_at
+        self.updated_at = updated_at
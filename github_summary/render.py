@@ -0,0 +1,116 @@
+"""HTML fragments for the report commands
+
+Everything here yields fragments instead of concatenating strings, the commands join the output once.
+"""
+
+PROJECT_TABLE_HEADER = '<table datatable="ng"' \
+                       '       dt-options="dtOptions"' \
+                       '       class="table table-striped table-bordered"' \
+                       '       style="width: 100%">' \
+                       '  <thead>' \
+                       '    <tr>' \
+                       '      <th scope="col">Organization</th>' \
+                       '      <th scope="col">Project</th>' \
+                       '      <th scope="col">Status</th>' \
+                       '      <th scope="col">Issue #</th>' \
+                       '      <th scope="col">Title</th>' \
+                       '      <th scope="col">Description</th>' \
+                       '    </tr>' \
+                       '  </thead>' \
+                       '  <tbody>'
+
+
+def truncate(body, limit: int = None):
+    """Shortens a PR/issue body to `limit` characters, no limit keeps the whole body"""
+    body = str(body)
+    if limit and len(body) > limit:
+        return body[:limit] + "..."
+    return body
+
+
+def pr(organization: str, repo_name: str, pr, author: str, body_limit: int = None):
+    return f"<h3>{organization}/{repo_name}#{pr.number} {pr.title}</h3>" \
+           f"<i>Created: {author} </i><br>" \
+           f"{truncate(pr.body, body_limit)}<br>"
+
+
+def issue(organization: str, repo_name: str, issue, author: str, body_limit: int = None):
+    return f"<h3>{organization}/{repo_name}#{issue.number} {issue.title}</h3>" \
+           f"<i>Created: {author} </i><br>" \
+           f"<i>Assigned: {issue.assignee.login if issue.assignee else ''} </i><br>" \
+           f"{truncate(issue.body, body_limit)}<br>"
+
+
+def repo_summary(organization: str, repo_name: str, sections: dict):
+    """Yields the summary of a repo from the lists of fragments per section, nothing if every section is empty"""
+    if not any(sections.values()):
+        return
+
+    yield f"<h1>Summary for {organization}/{repo_name}</h1>"
+
+    for key, title in (("open_prs", "Open PRs"), ("closed_prs", "Closed PRs"),
+                       ("opened_tickets", "Open Tickets"), ("closed_tickets", "Closed Tickets")):
+        if sections[key]:
+            yield f"<h2>{title}</h2>"
+            yield from sections[key]
+
+
+def pr_table(organization: str, repo_name: str, rows):
+    """Yields the open/closed table for (pr, author) rows"""
+    yield "<table><th><td>PR</td><td>Developer</td><td>Open Date</td><td>Closed Date<td><th>"
+
+    for pr, author in rows:
+        yield f"<tr><td>{organization}/{repo_name}#{pr.number} {pr.title}</td>" \
+              f"<td>{author} </td>" \
+              f"<td>{pr.created_at}</td>" \
+              f"<td>{pr.merged_at}</td></tr>"
+
+    yield "</table>"
+
+
+def metrics_table(stats: dict):
+    yield "<table>" \
+          "<tr>" \
+          "<td>Week</td>" \
+          "<td>Date</td>" \
+          "<td>Total Open</td>" \
+          "<td>Total Closed</td>" \
+          "</tr>"
+
+    for day in stats:
+        yield f"<tr>" \
+              f"<td>{day}</td>" \
+              f"<td>{stats[day]['date']}</td>" \
+              f"<td>{stats[day]['created']}</td>" \
+              f"<td>{stats[day]['merged']}</td>" \
+              f"</tr>"
+
+    yield "</table>"
+
+
+def change_log(bugs: list, features: list):
+    if bugs:
+        yield "<br>#### Bug Fixes"
+        yield from bugs
+
+    if features:
+        yield "<br><br>#### Added Features"
+        yield from features
+
+
+def project_table(rows, body_limit: int = None):
+    """Yields the project table for (organization, project, column, issue) rows"""
+    yield PROJECT_TABLE_HEADER
+
+    for organization, project, column, issue in rows:
+        yield f"<tr>" \
+              f"  <td>{organization}</td>" \
+              f"  <td>{project}</td> " \
+              f"  <td>{column}</td> " \
+              f"  <td>{issue.number}</td> " \
+              f"  <td>{issue.title}</td> " \
+              f"  <td>{truncate(issue.body, body_limit)}</td>" \
+              f"</tr>"
+
+    yield '</tbody>' \
+          '</table>'
@@ -0,0 +1,221 @@
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock, a single writer per directory is assumed there
+    fcntl = None
+
+BACKENDS = ("json", "jsonl", "sqlite")
+
+
+def ticket_key(ticket: dict):
+    return f'{ticket["organization"]}/{ticket["repo"]}/{ticket["number"]}'
+
+
+def write_atomic(path: str, content: str):
+    # A temporary file of its own, so concurrent writers (possibly on other hosts sharing the directory) never
+    # replace or remove each other's
+    descriptor, temporary = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.",
+                                             dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(descriptor, 'w') as outfile:
+            outfile.write(content)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """Holds an exclusive lock on `path` (created if missing) against other processes"""
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class TicketStore:
+    """Keeps the synced tickets of a directory, keyed by organization/repo/number
+
+    `load` remembers what was read, so `save` only writes the tickets that actually changed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.saved = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load(self):
+        tickets = self.read()
+        self.saved = {key: json.dumps(ticket, sort_keys=True) for key, ticket in tickets.items()}
+        return tickets
+
+    def save(self, tickets: dict):
+        """Writes the changed tickets in one batch, returns how many were written"""
+        changed = dict()
+        for key, ticket in tickets.items():
+            serialized = json.dumps(ticket, sort_keys=True)
+            if self.saved.get(key) != serialized:
+                changed[key] = (ticket, serialized)
+
+        if changed:
+            self.write(changed)
+            self.saved.update({key: serialized for key, (ticket, serialized) in changed.items()})
+
+        return len(changed)
+
+    def read(self):
+        raise NotImplementedError
+
+    def write(self, changed: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class DirectoryTicketStore(TicketStore):
+    """The original layout: one <number>.json per ticket
+
+    A ticket whose number is already taken by a ticket of another repo goes to <organization>_<repo>_<number>.json
+    instead, and keeps the file it was read from, so same numbered tickets of different repos never share a file.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        # key -> file the ticket was read from or written to
+        self.files = dict()
+
+    def read(self):
+        tickets = dict()
+        self.files = dict()
+        for file in os.listdir(self.directory):
+            if file.endswith(".json"):
+                with open(f"{self.directory}/{file}") as json_file:
+                    ticket = json.load(json_file)
+                tickets[ticket_key(ticket)] = ticket
+                self.files[ticket_key(ticket)] = file
+        return tickets
+
+    def file_for(self, key: str, ticket: dict):
+        if key not in self.files:
+            file = f"{ticket['number']}.json"
+            if file in self.files.values() or self.owner(file) not in (None, key):
+                file = f"{ticket['organization']}_{ticket['repo']}_{ticket['number']}.json"
+            self.files[key] = file
+        return self.files[key]
+
+    def owner(self, file: str):
+        """Returns the key of the ticket in `file`, None when there is no such file"""
+        if not os.path.exists(f"{self.directory}/{file}"):
+            return None
+        with open(f"{self.directory}/{file}") as json_file:
+            return ticket_key(json.load(json_file))
+
+    def write(self, changed: dict):
+        for key, (ticket, serialized) in changed.items():
+            write_atomic(f"{self.directory}/{self.file_for(key, ticket)}", serialized)
+
+
+class JsonLinesTicketStore(TicketStore):
+    """Appends changed tickets to tickets.jsonl, the last record of a key wins
+
+    The log is compacted into one record per ticket once it holds more than `compact_ratio` records per ticket.
+    Appends and compactions hold tickets.jsonl.lock, and a compaction re-reads the log first, so records other
+    writers appended since this store was loaded are kept.
+    """
+
+    def __init__(self, directory: str, compact_ratio: int = 2):
+        super().__init__(directory)
+        self.path = f"{directory}/tickets.jsonl"
+        self.lock_path = f"{self.path}.lock"
+        self.compact_ratio = compact_ratio
+        self.records = 0
+
+    def read(self):
+        return {key: json.loads(serialized) for key, serialized in self.read_log().items()}
+
+    def read_log(self):
+        """Returns the latest serialized record of every key and counts the records of the log"""
+        latest = dict()
+        self.records = 0
+        if os.path.exists(self.path):
+            with open(self.path) as log:
+                for line in log:
+                    try:
+                        latest[ticket_key(json.loads(line))] = line.strip()
+                    except (KeyError, TypeError, ValueError):
+                        # Blank, or torn by a crash mid-append; the next compaction drops it
+                        continue
+                    self.records += 1
+        return latest
+
+    def write(self, changed: dict):
+        with file_lock(self.lock_path):
+            with open(self.path, 'ab+') as log:
+                # Records start on a line of their own, even after a torn one
+                separator = b""
+                if log.seek(0, os.SEEK_END):
+                    log.seek(-1, os.SEEK_END)
+                    separator = b"" if log.read(1) == b"\n" else b"\n"
+                log.write(separator + "".join(f"{serialized}\n" for ticket, serialized in changed.values()).encode())
+                log.flush()
+                os.fsync(log.fileno())
+            self.records += len(changed)
+
+            if self.records > self.compact_ratio * max(len(set(self.saved) | set(changed)), 1):
+                self.compact()
+
+    def compact(self):
+        """Rewrites the log as it is on disk, one record per ticket; the caller holds the lock"""
+        latest = self.read_log()
+
+        write_atomic(self.path, "".join(f"{serialized}\n" for serialized in latest.values()))
+        self.records = len(latest)
+
+
+class SqliteTicketStore(TicketStore):
+    """Keeps the tickets in tickets.sqlite keyed by organization/repo/number"""
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.db = sqlite3.connect(f"{directory}/tickets.sqlite", check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS tickets (key TEXT PRIMARY KEY, ticket TEXT)")
+        self.db.commit()
+
+    def read(self):
+        return {key: json.loads(ticket) for key, ticket in self.db.execute("SELECT key, ticket FROM tickets")}
+
+    def write(self, changed: dict):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO tickets VALUES (?, ?)",
+                                [(key, serialized) for key, (ticket, serialized) in changed.items()])
+
+    def close(self):
+        self.db.close()
+
+
+def open_ticket_store(directory: str, backend: str = "json"):
+    if backend == "jsonl":
+        return JsonLinesTicketStore(directory)
+    if backend == "sqlite":
+        return SqliteTicketStore(directory)
+    if backend not in (None, "", "json"):
+        raise ValueError(f"Unknown ticket store '{backend}', expected one of {', '.join(BACKENDS)}")
+    return DirectoryTicketStore(directory)
@@ -0,0 +1,155 @@
+from threading import Lock
+import requests
+from github.Requester import Requester
+
+try:
+    from .credentials import POOL_AUTHORIZATION
+    from .ratelimit import resource_for
+except:
+    from credentials import POOL_AUTHORIZATION
+    from ratelimit import resource_for
+
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+
+class CachedResponse:
+    """Mimics the response object PyGithub reads from its connection classes"""
+
+    def __init__(self, status: int, headers: dict, text: str):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.text
+
+
+class CachingHTTPSConnection:
+    """PyGithub connection class that revalidates cached GETs with ETag / If-Modified-Since
+
+    GitHub answers unchanged resources with a 304, which is served from the store and does not count against the
+    rate limit. Sessions are shared per host (and pooled credential) so connections stay alive between requests.
+    Requests of the pooled client are sent with the credential of `credentials` that has the most budget left.
+    `connection_classes` derives the classes each client uses, with its own store, scheduler and sessions.
+    """
+
+    protocol = "https"
+    default_port = 443
+
+    store = None
+    scheduler = None
+    credentials = None
+    sessions = dict()
+    sessions_lock = Lock()
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.host = host
+        self.port = port if port else self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.retry = retry
+        self.pool_size = pool_size
+        self.session = self.get_session(retry, pool_size)
+
+    def get_session(self, retry, pool_size, credential=None):
+        key = (self.protocol, self.host, self.port, credential.name if credential else None)
+
+        with self.sessions_lock:
+            if key not in self.sessions:
+                session = requests.Session()
+                # Keep a connection alive for every request the scheduler lets through at once
+                if self.scheduler is not None:
+                    pool_size = max(pool_size if pool_size else 10, self.scheduler.max_concurrent)
+                if retry or pool_size:
+                    adapter = requests.adapters.HTTPAdapter(max_retries=retry if retry else 0,
+                                                            pool_maxsize=pool_size if pool_size else 10)
+                    session.mount(f"{self.protocol}://", adapter)
+                self.sessions[key] = session
+
+            return self.sessions[key]
+
+    def request(self, verb, url, input, headers):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self):
+        url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+        headers = dict(self.headers)
+
+        # Requests that already carry validators are left to the caller
+        cached = None
+        if self.store is not None and self.verb == "GET" and not any(h in headers for h in CONDITIONAL_HEADERS):
+            cached = self.store.get(url)
+            if cached is not None:
+                cached_headers = {key.lower(): value for key, value in cached[1].items()}
+                if "etag" in cached_headers:
+                    headers["If-None-Match"] = cached_headers["etag"]
+                if "last-modified" in cached_headers:
+                    headers["If-Modified-Since"] = cached_headers["last-modified"]
+
+        response = self.send(url, headers)
+
+        if cached is not None and response.status == 304:
+            # Keep the cached Link/ETag headers, but report the current rate limit
+            return CachedResponse(cached[0], dict(cached[1], **response.headers), cached[2])
+
+        if self.store is not None and self.verb == "GET" and response.status == 200 and \
+                ("ETag" in response.headers or "Last-Modified" in response.headers):
+            self.store.set(url, response.status, response.headers, response.text)
+
+        return response
+
+    def send(self, url: str, headers: dict):
+        if self.scheduler is None:
+            return self.send_once(url, headers)
+
+        def send_with(credential):
+            if credential is not None:
+                headers["Authorization"] = f"token {credential.token()}"
+                self.session = self.get_session(self.retry, self.pool_size, credential)
+            response = self.send_once(url, headers)
+            return response, response.status, response.headers, response.text
+
+        # List endpoints answer with a JSON array (or search "items") and paginate through Link headers
+        def page(response):
+            return self.verb == "GET" and (response.text.startswith("[") or "Link" in response.headers)
+
+        pooled = self.credentials is not None and headers.get("Authorization") == POOL_AUTHORIZATION
+        return self.scheduler.send(resource_for(self.url), send_with, self.credentials if pooled else None, page,
+                                   f"{self.verb} {self.url}")
+
+    def send_once(self, url: str, headers: dict):
+        r = self.session.request(self.verb, url, headers=headers, data=self.input, timeout=self.timeout,
+                                 verify=self.verify, allow_redirects=False)
+        return CachedResponse(r.status_code, dict(r.headers), r.text)
+
+    def close(self):
+        pass
+
+
+class CachingHTTPConnection(CachingHTTPSConnection):
+    protocol = "http"
+    default_port = 80
+
+
+def connection_classes(store, scheduler=None, credentials=None):
+    """Returns HTTP and HTTPS connection classes of their own, bound to one client's store, scheduler and credential
+    pool"""
+    attributes = {"store": store, "scheduler": scheduler, "credentials": credentials,
+                  "sessions": dict(), "sessions_lock": Lock()}
+    return (type("CachingHTTPConnection", (CachingHTTPConnection,), attributes),
+            type("CachingHTTPSConnection", (CachingHTTPSConnection,), attributes))
+
+
+def install(store, scheduler=None, credentials=None):
+    """Routes the requests of the PyGithub clients built next through caching connections backed by `store`,
+    paced by `scheduler` and spread over the `credentials` pool
+
+    A Requester keeps the connection class it was built with, so clients built before keep their own.
+    """
+    Requester.injectConnectionClasses(*connection_classes(store, scheduler, credentials))
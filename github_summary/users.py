@@ -0,0 +1,78 @@
+from threading import RLock
+import atexit
+import json
+import os
+import tempfile
+import time
+
+try:
+    from .cache import TTLCache
+except:
+    from cache import TTLCache
+
+
+class UserCache(TTLCache):
+    """Maps logins to display names so the same maintainers are not looked up for every PR, issue and comment
+
+    Reading `name` on a PyGithub NamedUser can force a completion request, the login is always present.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 24 * 3600, path: str = None, save_interval: float = 60):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.path = None
+        self.save_interval = save_interval
+        self.saved = 0
+        # Serializes the saves of the workers that fill the cache concurrently
+        self.save_lock = RLock()
+
+        if path:
+            self.persist(path)
+
+    def persist(self, path: str):
+        """Loads any names stored at `path` and saves the cache back to it from now on"""
+        if self.path is None:
+            atexit.register(self.save)
+        self.path = path
+
+        if os.path.exists(path):
+            with open(path) as json_file:
+                for login, (name, stored) in json.load(json_file).items():
+                    self.set(login, name, stored=stored)
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self.save_lock:
+            entries = {login: [name, stored] for login, name, stored in self.items()}
+
+            # A temporary file of its own in the same directory, so no other save can replace or remove it midway
+            descriptor, temporary = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.",
+                                                     dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(descriptor, 'w') as outfile:
+                    json.dump(entries, outfile)
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+            self.saved = time.time()
+
+    def display_name(self, user):
+        name = self.get(user.login)
+
+        if name is None:
+            name = user.name if user.name else user.login
+            self.set(user.login, name)
+
+            if self.path:
+                with self.save_lock:
+                    if time.time() - self.saved > self.save_interval:
+                        self.save()
+
+        return name
+
+
+# Shared by every GithubSummary in the process
+user_cache = UserCache()
@@ -0,0 +1,316 @@
+"""Applies GitHub webhook deliveries to the ticket store and the activity mirror
+
+Pushed changes keep local state current without polling; the regular syncs and mirror refreshes still run now and
+then to reconcile anything a missed delivery left out.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Queue
+from threading import Lock, Thread
+import hashlib
+import hmac
+import json
+import logging
+import os
+
+try:
+    from .records import CommentRecord, IssueRecord, Label, PullRecord, User, parse_timestamp, split_url
+    from .ticket_store import ticket_key
+except:
+    from records import CommentRecord, IssueRecord, Label, PullRecord, User, parse_timestamp, split_url
+    from ticket_store import ticket_key
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ("issues", "issue_comment", "pull_request", "project_card")
+
+
+def verify_signature(secret: str, body: bytes, signature: str):
+    """Checks the X-Hub-Signature-256 header GitHub computes over the raw body with the webhook secret"""
+    if not secret or not signature:
+        return False
+
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class WebhookProcessor:
+    """Turns webhook payloads into ticket and mirror updates
+
+    Tickets are only updated when they are already in the store, or when a project card brings a new issue onto a
+    board. `last_modified` and the `comments_synced` cursor are left as they were, so the next sync still
+    revalidates every pushed ticket once and fetches any comment a missed delivery left out.
+    """
+
+    def __init__(self, client, directory: str = None):
+        self.client = client
+        self.directory = directory
+        self.lock = Lock()
+
+    def display_name(self, user: dict):
+        if user is None:
+            return None
+
+        # Payload users carry no name, the cache (or one lookup) supplies it
+        name = self.client.users.get(user["login"])
+        if name is None:
+            name = self.client.users.display_name(self.client.g.get_user(user["login"]))
+        return name
+
+    def to_user(self, user: dict):
+        return User(user["login"], self.display_name(user)) if user else None
+
+    def to_issue(self, issue: dict):
+        return IssueRecord(number=issue["number"], title=issue["title"], body=issue["body"], state=issue["state"],
+                           user=self.to_user(issue["user"]), assignee=self.to_user(issue.get("assignee")),
+                           labels=[Label(label["name"]) for label in issue.get("labels", [])],
+                           created_at=parse_timestamp(issue["created_at"]),
+                           updated_at=parse_timestamp(issue["updated_at"]),
+                           closed_at=parse_timestamp(issue.get("closed_at")))
+
+    def to_pull(self, pr: dict):
+        return PullRecord(number=pr["number"], title=pr["title"], body=pr["body"], state=pr["state"],
+                          user=self.to_user(pr["user"]),
+                          labels=[Label(label["name"]) for label in pr.get("labels", [])],
+                          created_at=parse_timestamp(pr["created_at"]),
+                          updated_at=parse_timestamp(pr["updated_at"]),
+                          closed_at=parse_timestamp(pr.get("closed_at")),
+                          merged_at=parse_timestamp(pr.get("merged_at")),
+                          base=pr["base"]["ref"])
+
+    def to_comment(self, comment: dict):
+        return CommentRecord(id=comment["id"], body=comment["body"], user=self.to_user(comment["user"]),
+                             created_at=parse_timestamp(comment["created_at"]),
+                             updated_at=parse_timestamp(comment["updated_at"]))
+
+    def apply(self, event: str, payload: dict):
+        """Applies one delivery, returns whether the event is one this processor handles"""
+        return self.apply_all([(event, payload)]) == 1
+
+    def apply_all(self, deliveries):
+        """Applies (event, payload) pairs in order with one ticket store load and save, returns how many were
+        handled"""
+        handled = 0
+        # The syncs of the same directory wait for the deliveries, and the other way around
+        with self.client.directory_lock(self.directory) if self.directory else self.lock:
+            tickets = None
+            store = None
+            if self.directory:
+                store = self.client.open_ticket_store(self.directory)
+                tickets = store.load()
+
+            try:
+                for event, payload in deliveries:
+                    if event not in EVENTS:
+                        continue
+
+                    getattr(self, f"on_{event}")(payload, tickets)
+                    handled += 1
+
+                    # Cached reports of the repo no longer match
+                    if "repository" in payload:
+                        self.client.invalidate_reports(payload["repository"]["full_name"])
+
+                if store is not None:
+                    store.save(tickets)
+            finally:
+                if store is not None:
+                    store.close()
+
+        return handled
+
+    def on_issues(self, payload: dict, tickets: dict):
+        full_name = payload["repository"]["full_name"]
+        issue = payload["issue"]
+
+        if self.client.mirror:
+            if payload["action"] == "deleted":
+                self.client.mirror.delete_issue(full_name, issue["number"])
+            else:
+                self.client.mirror.store_issue(full_name, self.to_issue(issue))
+
+        ticket = self.find_ticket(tickets, issue["url"])
+        if ticket is None or payload["action"] == "deleted":
+            return
+
+        ticket["body"] = str(issue["body"])
+        ticket["assigned"] = str(self.display_name(issue["user"]))
+        ticket["title"] = str(issue["title"])
+        ticket["status"] = str(issue["state"])
+
+    def on_issue_comment(self, payload: dict, tickets: dict):
+        full_name = payload["repository"]["full_name"]
+        issue = payload["issue"]
+        comment = payload["comment"]
+
+        if self.client.mirror:
+            if payload["action"] == "deleted":
+                self.client.mirror.delete_comment(full_name, comment["id"])
+            else:
+                self.client.mirror.store_comment(full_name, issue["number"], self.to_comment(comment))
+
+        ticket = self.find_ticket(tickets, issue["url"])
+        if ticket is None:
+            return
+
+        comments = ticket.setdefault("comments", dict())
+        if payload["action"] == "deleted":
+            comments.pop(str(comment["id"]), None)
+        else:
+            # The same fields get_ticket_details stores, its comments_synced cursor stays where the last sync left it
+            record = self.to_comment(comment)
+            comments[str(record.id)] = {
+                "body": str(record.body),
+                "created": str(record.created_at),
+                "updated": str(record.updated_at),
+                "user": str(record.user.name),
+                "id": str(record.id),
+            }
+
+    def on_pull_request(self, payload: dict, tickets: dict):
+        if self.client.mirror:
+            self.client.mirror.store_pull(payload["repository"]["full_name"], self.to_pull(payload["pull_request"]))
+
+    def on_project_card(self, payload: dict, tickets: dict):
+        card = payload["project_card"]
+        if tickets is None or not card.get("content_url"):
+            return
+
+        organization, repo_name, number = split_url(card["content_url"])
+        key = ticket_key({"organization": organization, "repo": repo_name, "number": number})
+        ticket = tickets.get(key)
+
+        # A moved card leaves its old column
+        if ticket is not None and payload["action"] in ("moved", "deleted"):
+            column_id = payload.get("changes", {}).get("column_id", {}).get("from", card["column_id"])
+            old = self.project_column(column_id)
+            ticket["project"] = [entry for entry in ticket.get("project", []) if entry != old]
+
+        if payload["action"] not in ("created", "moved", "converted"):
+            return
+
+        if ticket is None:
+            ticket = {"project": [], "repo": repo_name, "organization": organization, "number": str(number)}
+            tickets[key] = self.client.get_ticket_details(organization, repo_name, ticket=ticket, issue_number=number)
+
+        entry = self.project_column(card["column_id"])
+        if entry not in ticket["project"]:
+            ticket["project"].append(entry)
+
+    def project_column(self, column_id: int):
+        """Returns the {"project", "column"} entry a ticket keeps for a project column"""
+
+        def load():
+            column = self.client.g.get_project_column(int(column_id))
+            project = self.client.g.get_project(int(column.project_url.rsplit("/", 1)[1]))
+            return {"project": str(project.name), "column": str(column.name)}
+
+        return dict(self.client.get_handle(f"column:{column_id}", load))
+
+    def find_ticket(self, tickets: dict, url: str):
+        if tickets is None:
+            return None
+
+        organization, repo_name, number = split_url(url)
+        return tickets.get(ticket_key({"organization": organization, "repo": repo_name, "number": number}))
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    receiver = None
+    secret = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if not verify_signature(self.secret, body, self.headers.get("X-Hub-Signature-256")):
+            logger.warning(f"Rejected webhook delivery {self.headers.get('X-GitHub-Delivery')} with a bad signature")
+            return self.reply(401)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.reply(400)
+
+        # Applying can wait on a running sync of the ticket directory, far past GitHub's delivery timeout
+        self.receiver.queue.put((self.headers.get("X-GitHub-Event"), payload, self.headers.get("X-GitHub-Delivery")))
+        self.reply(202)
+
+    def reply(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class WebhookReceiver:
+    """Listens for webhook deliveries on `port` in a background thread
+
+    Deliveries are acknowledged as soon as their signature checks out and applied in arrival order by a worker
+    thread, the ones that queued up meanwhile in one batch.
+    """
+
+    def __init__(self, processor: WebhookProcessor, port: int, secret: str, host: str = "0.0.0.0"):
+        if not secret:
+            raise ValueError("A webhook secret is required to verify deliveries")
+
+        self.processor = processor
+        self.queue = Queue()
+        handler = type("Handler", (WebhookHandler,), {"receiver": self, "secret": secret})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.thread = Thread(target=self.server.serve_forever, name="webhooks", daemon=True)
+        self.worker = Thread(target=self.work, name="webhook-deliveries", daemon=True)
+
+    def start(self):
+        self.worker.start()
+        self.thread.start()
+        logger.info(f"Listening for GitHub webhooks on port {self.server.server_address[1]}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.queue.put(None)
+        self.worker.join()
+
+    def work(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            stop = batch[-1] is None
+            self.apply([delivery for delivery in batch if delivery is not None])
+            if stop:
+                return
+
+    def apply(self, batch):
+        if not batch:
+            return
+
+        try:
+            self.processor.apply_all([(event, payload) for event, payload, delivery_id in batch])
+        except Exception:
+            if len(batch) == 1:
+                logger.exception(f"Failed to apply webhook delivery {batch[0][2]}")
+                return
+
+            # One at a time, so a delivery that fails does not take the others with it
+            for delivery in batch:
+                self.apply([delivery])
+
+
+def replay(processor: WebhookProcessor, directory: str):
+    """Applies recorded deliveries, {"event": ..., "payload": ...} JSON files applied in file name order"""
+    deliveries = list()
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".json"):
+            with open(os.path.join(directory, file)) as json_file:
+                delivery = json.load(json_file)
+            deliveries.append((delivery["event"], delivery["payload"]))
+
+    return processor.apply_all(deliveries)
+
@@ -22,7 +22,7 @@ setup(
     author_email=" ",
     license="MIT",
     packages=["github_summary"],
-    install_requires=["brewtils", "pygithub"],
+    install_requires=["brewtils", "pygithub>=1.59,<2", "requests"],
     classifiers=[
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",